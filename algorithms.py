@@ -17,82 +17,159 @@
 import numpy as np
 from time import sleep
 import sys
-from collections import defaultdict
+import bisect
+from collections import defaultdict, OrderedDict
+
+# Sorted table of all primes up to a limit, built with a sieve of Eratosthenes
+# and extended whenever a query exceeds it. It is shared by all nodes and
+# iterations.
+class PrimeTable():
+    def __init__(self, limit=1024):
+        self.limit = 0
+        self.primes = []
+        self.extend(limit)
+
+    def extend(self, limit):
+        sieve = np.ones(limit + 1, dtype=bool)
+        sieve[:2] = False
+        for i in range(2, int(limit**0.5) + 1):
+            if sieve[i]:
+                sieve[i*i::i] = False
+        self.primes = np.flatnonzero(sieve).tolist()
+        self.limit = limit
+
+    # Return the smallest prime that is not less than n
+    def getPrimeFrom(self, n):
+        while n > self.primes[-1]:
+            # there is always a prime between n and 2n
+            self.extend(2 * max(self.limit, n))
+        return self.primes[bisect.bisect_left(self.primes, n)]
+
+prime_table = PrimeTable()
+
 
 def getNextPrime(M=1, greaterOnly=False):
-    def is_prime(n):
-        """ check if n is prime"""
-        i = 2
-        if n <=1:
-            return False
-        Sqrt_Of_n = n**0.5
-        while i <= Sqrt_Of_n:
-            if n % i == 0:
-                return False
-            i += 1
+    if M < 2: return 2
+    if greaterOnly:
+        return prime_table.getPrimeFrom(M + 1)
+    return prime_table.getPrimeFrom(M)
+
+
+# Least recently used cache for the period tables of the deterministic hopping
+# functions, each table is an integer array. It is shared by all nodes and
+# iterations and holds at most max_size table entries in total.
+class PeriodTableCache():
+    def __init__(self, max_size=2**22):
+        self.tables = OrderedDict()
+        self.size = 0
+        self.max_size = max_size
+
+    def get(self, key, create):
+        if key in self.tables:
+            table = self.tables.pop(key)
         else:
-            return True
-            
-    i = M
-    if i < 2: return 2
-    for i in range(i,2*M):
-        if is_prime(i):
-            if greaterOnly:
-                if M != i:
-                    break
-            else:
-                break
-    return i
+            table = create()
+            self.size += len(table)
+            # evict least recently used tables, but always keep the new one
+            while self.size > self.max_size and self.tables:
+                (k, old) = self.tables.popitem(last=False)
+                self.size -= len(old)
+        self.tables[key] = table
+        return table
+
+    def clear(self):
+        self.tables.clear()
+        self.size = 0
+
+period_tables = PeriodTableCache()
 
 
 class Rendezvous():
-    def __init__(self, name, channelset, verbose=True):
+    def __init__(self, name, channelset, verbose=True, rng=np.random):
         self.name = name
         self.channelset = channelset
         self.M = channelset.getMaxNumChannels()
         self.N = channelset.getNumChannels()
         self.verbose = verbose
+        self.rng = rng # all random numbers are drawn from this generator
+        self.ids = None # channel ids as array, see getChannelIds()
  
     def getName(self):
         return self.name
 
-    def trace(self, message=''):
-        if self.verbose: print "   %s:\t%s" % (self.name, message)           
+    # Return the ids of the channel set by index as array
+    def getChannelIds(self):
+        if self.ids is None:
+            self.ids = self.channelset.getChannelIdsAsArray()
+        return self.ids
+
+    """ Return the channel ids of the next k slots as array. The state after
+    the call and all random numbers drawn are the same as for k calls of
+    getNextChannel(), subclasses override this with vectorized versions. """
+    def getNextChannels(self, k):
+        return np.array([self.getNextChannel() for n in range(k)], dtype=int)
+
+    """ Skip the next k slots, e.g. the asynchronous start of a node. The
+    state afterwards is the same as after k calls of getNextChannel(),
+    subclasses jump ahead in closed form or draw their random numbers in bulk. """
+    def advance(self, k):
+        self.getNextChannels(k)
+
+    """ Return one period of the channel ids selected in the first slots after
+    initialization, or None if the algorithm has no deterministic schedule. """
+    def getSchedule(self):
+        return None
+
+    """ Return the number of slots after which the channel ids selected since
+    initialization repeat, or None if the algorithm draws random channels. """
+    def getPeriod(self):
+        return None
+
+    # The message is only formatted with args if tracing is enabled
+    def trace(self, message='', *args):
+        if self.verbose: print "   %s:\t%s" % (self.name, message % args if args else message)           
 
 # Theis et al. "Rendezvous for Cognitive Radios" 
 # http://ieeexplore.ieee.org/stamp/stamp.jsp?arnumber=5439004
 class RandomRendezvous(Rendezvous):
-    def __init__(self, channelset, verbose):
-        Rendezvous.__init__(self, "Random", channelset, verbose)
+    def __init__(self, channelset, verbose, rng=np.random):
+        Rendezvous.__init__(self, "Random", channelset, verbose, rng)
     
     """ override base class function, return random channel number between 0 and number of channels """
     def getNextChannel(self):
         #print "num channels: %d" % self.N
-        r = np.random.randint(0, self.N) # draw random number between 0 and nr_of_channels
+        r = self.rng.randint(0, self.N) # draw random number between 0 and nr_of_channels
         #print "rand: %d" % r
-        return (self.channelset.getChannelByIndex(r))
+        return (self.channelset.getChannelIdByIndex(r))
+
+    # drawing k numbers at once gives the same numbers as k single draws
+    def getNextChannels(self, k):
+        return self.getChannelIds()[self.rng.randint(0, self.N, size=k)]
+
+    def advance(self, k):
+        self.rng.randint(0, self.N, size=k)
 
 
 # Theis et al. "Rendezvous for Cognitive Radios" 
 # http://ieeexplore.ieee.org/stamp/stamp.jsp?arnumber=5439004
 class ModularClockRendezvous(Rendezvous):
-    def __init__(self, channelset, verbose):
-        Rendezvous.__init__(self, "ModularClock", channelset, verbose)
+    def __init__(self, channelset, verbose, rng=np.random):
+        Rendezvous.__init__(self, "ModularClock", channelset, verbose, rng)
         self.nr_of_channels = channelset.getNumChannels()
         self.p = getNextPrime(self.nr_of_channels)
-        self.j_old = np.random.randint(0, self.nr_of_channels) # pick first channel randomly
+        self.j_old = self.rng.randint(0, self.nr_of_channels) # pick first channel randomly
         self.renew_rate()
         self.current_slot = 1
-        self.trace("prime: %d" % self.p)
-        self.trace("j_old: %d" % self.j_old)        
+        self.trace("prime: %d", self.p)
+        self.trace("j_old: %d", self.j_old)        
 
     def renew_rate(self):
-        self.r = np.random.randint(0, self.p) # pick hopping "rate"
-        self.trace("rate: %d" % self.r)
+        self.r = self.rng.randint(0, self.p) # pick hopping "rate"
+        self.trace("rate: %d", self.r)
 
     def getNextChannel(self):
         # renew rate every 2*p slots
-        self.trace("Currslot: %d" % self.current_slot)
+        self.trace("Currslot: %d", self.current_slot)
         if self.current_slot > (2*self.p):
             self.renew_rate()
             self.current_slot = 1
@@ -101,37 +178,65 @@ class ModularClockRendezvous(Rendezvous):
         
         # calculate new channel
         j_new = (self.j_old + self.r) % self.p
-        self.trace("j_new: %d" % j_new)
+        self.trace("j_new: %d", j_new)
         # wrap around if needed
         if j_new < self.nr_of_channels:
             c = j_new
         else:
             c = j_new % self.nr_of_channels
-            self.trace("c: %d" % c)
+            self.trace("c: %d", c)
         self.j_old = j_new # overwrite old value       
-        return (self.channelset.getChannelByIndex(c))
+        return (self.channelset.getChannelIdByIndex(c))
+
+    def getNextChannels(self, k):
+        j = np.empty(k, dtype=int)
+        pos = 0
+        while pos < k:
+            # the slot that renews the rate counts as first slot of the next 2*p+1
+            if self.current_slot > (2*self.p):
+                self.renew_rate()
+                self.current_slot = 0
+            n = min(k - pos, 2*self.p + 1 - self.current_slot)
+            j[pos:pos + n] = (self.j_old + self.r * np.arange(1, n + 1)) % self.p
+            self.j_old = j[pos + n - 1]
+            self.current_slot += n
+            pos += n
+        return self.getChannelIds()[j % self.nr_of_channels]
+
+    # The channel only depends on the sum of the rates, so each run of slots
+    # with the same rate is skipped at once
+    def advance(self, k):
+        pos = 0
+        while pos < k:
+            if self.current_slot > (2*self.p):
+                self.renew_rate()
+                self.current_slot = 0
+            n = min(k - pos, 2*self.p + 1 - self.current_slot)
+            self.j_old = (self.j_old + self.r * n) % self.p
+            self.current_slot += n
+            pos += n
 
 
 # Theis et al. "Rendezvous for Cognitive Radios" 
 # http://ieeexplore.ieee.org/stamp/stamp.jsp?arnumber=5439004
 class ModifiedModularClockRendezvous(Rendezvous):
-    def __init__(self, channelset, verbose):
-        Rendezvous.__init__(self, "ModifiedModularClock", channelset, verbose)
-        rand = np.random.randint(self.N, 2*self.N)
+    def __init__(self, channelset, verbose, rng=np.random):
+        Rendezvous.__init__(self, "ModifiedModularClock", channelset, verbose, rng)
+        rand = self.rng.randint(self.N, 2*self.N)
         self.p = getNextPrime(rand)
-        self.j_old = np.random.randint(0, self.N) # pick first channel randomly
+        self.j_old = self.rng.randint(0, self.N) # pick first channel randomly
         self.renew_rate()
         self.current_slot = 1
-        self.trace("prime: %d" % self.p)
-        self.trace("j_old: %d" % self.j_old)        
+        self.trace("prime: %d", self.p)
+        self.trace("j_old: %d", self.j_old)        
 
     def renew_rate(self):
-        self.r = np.random.randint(0, self.p) # pick hopping "rate"
-        self.trace("rate: %d" % self.r)
+        self.r = self.rng.randint(0, self.p) # pick hopping "rate"
+        self.trace("rate: %d", self.r)
 
     def getNextChannel(self):
         # renew rate every 2*p slots
-        self.trace("Currslot: %d" % self.current_slot)
+        self.trace("Currslot: %d", self.current_slot)
         if self.current_slot > (2*self.p):
             self.renew_rate()
             self.current_slot = 1
@@ -140,15 +245,35 @@ class ModifiedModularClockRendezvous(Rendezvous):
         
         # calculate new channel
         j_new = (self.j_old + self.r) % self.p
-        self.trace("j_new: %d" % j_new)
+        self.trace("j_new: %d", j_new)
         # wrap around if needed
         if j_new < self.N:
             c = j_new
         else:
-            c = np.random.randint(0, self.N)
-            self.trace("c: %d" % c)
+            c = self.rng.randint(0, self.N)
+            self.trace("c: %d", c)
         self.j_old = j_new # overwrite old value       
-        return (self.channelset.getChannelByIndex(c))
+        return (self.channelset.getChannelIdByIndex(c))
+
+    def getNextChannels(self, k):
+        c = np.empty(k, dtype=int)
+        pos = 0
+        while pos < k:
+            # the slot that renews the rate counts as first slot of the next 2*p+1
+            if self.current_slot > (2*self.p):
+                self.renew_rate()
+                self.current_slot = 0
+            n = min(k - pos, 2*self.p + 1 - self.current_slot)
+            j = (self.j_old + self.r * np.arange(1, n + 1)) % self.p
+            # random channels for all slots that wrap around, in slot order
+            wrapped = j >= self.N
+            if wrapped.any():
+                j[wrapped] = self.rng.randint(0, self.N, size=np.count_nonzero(wrapped))
+            self.j_old = (self.j_old + self.r * n) % self.p
+            c[pos:pos + n] = j
+            self.current_slot += n
+            pos += n
+        return self.getChannelIds()[c]
 
 # DaSilva et al. "Sequence-Based Rendezvous for Dynamic Spectrum Access"
 # http://ieeexplore.ieee.org/xpls/abs_all.jsp?arnumber=4658263
@@ -177,7 +302,7 @@ class SequenceRendezvous(Rendezvous):
             
         # Initialize starting index to random number
         self.index = np.random.randint(0, self.nr_of_channels)
-        self.trace("Start index: %d" % self.index)
+        self.trace("Start index: %d", self.index)
 
     
     def createSequence(self):
@@ -206,13 +331,13 @@ class SequenceRendezvous(Rendezvous):
 
 # Liu et al. "Jump-Stay Rendezvous Algorithm for Cognitive Radio Networks"
 class JSHoppingRendezvous(Rendezvous):
-    def __init__(self, channelset, verbose):
-        Rendezvous.__init__(self, "JSHopping", channelset, verbose)
+    def __init__(self, channelset, verbose, rng=np.random):
+        Rendezvous.__init__(self, "JSHopping", channelset, verbose, rng)
         
         # initialize algorithm
         self.P = getNextPrime(self.N)
-        self.r = np.random.randint(1, self.N + 1)
-        self.i = np.random.randint(1, self.P + 1)
+        self.r = self.rng.randint(1, self.N + 1)
+        self.i = self.rng.randint(1, self.P + 1)
         self.t = 0 # current time slot
         #self.test()
 
@@ -229,12 +354,12 @@ class JSHoppingRendezvous(Rendezvous):
     def update_r(self):
         self.r = ((self.r + 1) % (self.N + 1))
         if self.r == 0: self.r = 1
-        self.trace("New r: %d" % self.r)
+        self.trace("New r: %d", self.r)
 
     def update_i(self):
         self.i = ((self.i + 1) % (self.N + 1))
         if self.i == 0: self.i = 1
-        self.trace("New i: %d" % self.i)
+        self.trace("New i: %d", self.i)
     
     # Just call JumpStay here
     def getNextChannel(self):
@@ -242,53 +367,86 @@ class JSHoppingRendezvous(Rendezvous):
         # in simulation, channels start with index 0, do remapping
         c -= 1
         #print "c: %d" % c
-        return (self.channelset.getChannelByIndex(c))
+        return (self.channelset.getChannelIdByIndex(c))
+
+    # r cycles through N values every 3P slots, i through N values every
+    # 3NP slots, so all (r, i) rounds repeat after 3PN^2 slots
+    def getPeriod(self):
+        return 3 * self.P * self.N * self.N
         
-    # Technically, this is the inner loop of the JS_2 algorithm
-    def JumpStay(self):
+    # Each round of 3*P slots takes the rounds in whole slices
+    def getNextChannels(self, k):
+        c = np.empty(k, dtype=int)
+        pos = 0
+        while pos < k:
+            self.startRound()
+            offset = self.t % (3 * self.P)
+            n = min(k - pos, 3 * self.P - offset)
+            table = period_tables.get(("js", self.N, self.P, self.r, self.i),
+                                      lambda: self.createJSRound(self.N, self.P, self.r, self.i))
+            c[pos:pos + n] = table[offset:offset + n]
+            self.t += n
+            pos += n
+        # in simulation, channels start with index 0, do remapping
+        return self.getChannelIds()[c - 1]
+
+    # r is updated at each multiple of 3*P, i at each multiple of 3*N*P, both
+    # cycle through 1..N
+    def advance(self, k):
+        updates_r = (self.t + k - 1) // (3 * self.P) - (self.t - 1) // (3 * self.P)
+        updates_i = (self.t + k - 1) // (3 * self.N * self.P) - (self.t - 1) // (3 * self.N * self.P)
+        if updates_r:
+            self.r = (self.r - 1 + updates_r) % self.N + 1
+            if updates_i:
+                # i is drawn up to P and only enters the cycle with its first update
+                self.update_i()
+                self.i = (self.i - 1 + updates_i - 1) % self.N + 1
+            self.round = self.JSHopping(self.N, self.P, self.r, self.i)
+        self.t += k
+
+    # Update r and i if a new round starts in the current slot
+    def startRound(self):
         # Update r every 3*P time slots
         if (self.t % (3 * self.P)) == 0:
             self.trace("Update r in this round")
             self.update_r()
-        # Update i every 3*M*P slots
-        if (self.t % (3 * self.N * self.P)) == 0:
-            self.trace("Update i in this round")
-            self.update_i()
+            # Update i every 3*M*P slots
+            if (self.t % (3 * self.N * self.P)) == 0:
+                self.trace("Update i in this round")
+                self.update_i()
+            self.round = self.JSHopping(self.N, self.P, self.r, self.i)
+
+    # Technically, this is the inner loop of the JS_2 algorithm
+    def JumpStay(self):
+        self.startRound()
         
         # get channel for this specific slot
-        c = self.JSHopping(self.N, self.P, self.r, self.i, self.t)
-        self.trace("Slot: %d" % self.t)
-        self.trace("CH Index: %d" % c)
+        c = self.round[self.t % (3 * self.P)]
+        self.trace("Slot: %d", self.t)
+        self.trace("CH Index: %d", c)
         self.t += 1 # increment slot counter
         return c
 
     # Generate one round JS hopping sequence for the given paramaters
     def JSHopping(self, N, P, r, i, slot=-1):
-        nextround = []
-        for t in range(3*P):
-            t = t % (3*P)   # each round takes 3P timeslots
-            if t < (2*P):
-                # jump pattern
-                j = ((i + t*r -1) % P) + 1
-            else:
-                # stay pattern
-                j = r
-            if (j > N):
-                l = j
-                j = ((j - 1) % N) + 1 # remapping
-                
-            nextround.append(int(j))
-        if len(nextround) != 3*P:
-            print "ERROR!"
+        nextround = period_tables.get(("js", N, P, r, i), lambda: self.createJSRound(N, P, r, i))
 
         # return specific slot if t is given, return the whole round otherwise
-        self.trace(nextround)
         if slot >= 0:
             # wrap around 3*P cause slot can get bigger than that
             slot = (slot) % (3*P)
             return nextround[slot]
         return nextround
 
+    def createJSRound(self, N, P, r, i):
+        t = np.arange(3*P) # each round takes 3P timeslots
+        # jump pattern for the first 2P slots, stay pattern afterwards
+        j = np.where(t < (2*P), ((i + t*r - 1) % P) + 1, r)
+        # remapping
+        j = np.where(j > N, ((j - 1) % N) + 1, j)
+        self.trace(j)
+        return j
+
 
 class ExtendedJSHoppingRendezvous(Rendezvous):
     def __init__(self, nr_of_channels):
@@ -299,13 +457,13 @@ class ExtendedJSHoppingRendezvous(Rendezvous):
 
 # Yang et al. "Deterministic Rendezvous Scheme in Multichannel Access Networks"
 class DRSeqRendezvous(Rendezvous):
-    def __init__(self, channelset, verbose):
-        Rendezvous.__init__(self, "DRSEQ", channelset, verbose)
+    def __init__(self, channelset, verbose, rng=np.random):
+        Rendezvous.__init__(self, "DRSEQ", channelset, verbose, rng)
         # initialize algorithm
         self.P = getNextPrime(self.N)
         self.t = 0 # current time slot
-        self.trace("self.N: %d" % self.N)
-        self.trace("self.P: %d" % self.P)
+        self.trace("self.N: %d", self.N)
+        self.trace("self.P: %d", self.P)
         #self.test()
 
     # Simple functional test using the parameter given in the paper
@@ -325,38 +483,54 @@ class DRSeqRendezvous(Rendezvous):
     def getNextChannel(self):
         c = self.DRSEQHopping(self.N, self.t)
         self.t += 1
-        self.trace("Next channel index: %d" % c)
-        return (self.channelset.getChannelByIndex(c))
-
-    def DRSEQHopping(self, N, slot):
-        self.trace("-----")
-        self.trace("N: %d" % N)
-        self.trace("Slot: %d" % slot)
-        maxSeqLen = 2 * N + 1
-        self.trace("maxSeqLen: %d" % maxSeqLen)
-
-        slot = slot % maxSeqLen
-        self.trace("slot: %d" % slot)
-        
-        if slot < N:
-            return slot % N
-        elif slot == N:
+        self.trace("Next channel index: %d", c)
+        return (self.channelset.getChannelIdByIndex(c))
+
+    def getNextChannels(self, k):
+        table = period_tables.get(("drseq", self.N), lambda: self.createDRSEQTable(self.N))
+        c = table[(self.t + np.arange(k)) % len(table)]
+        self.t += k
+        # empty slots e, random channels in slot order
+        empty = c < 0
+        if empty.any():
+            c[empty] = self.rng.randint(0, self.N, size=np.count_nonzero(empty))
+        return self.getChannelIds()[c]
+
+    # Only the empty slots e, at position N of each period, draw random numbers
+    def advance(self, k):
+        period = 2 * self.N + 1
+        empty = (self.t + k - 1 - self.N) // period - (self.t - 1 - self.N) // period
+        if empty:
+            self.rng.randint(0, self.N, size=empty)
+        self.t += k
+
+    # Return channel index for given slot, return the whole period otherwise
+    def DRSEQHopping(self, N, slot=-1):
+        table = period_tables.get(("drseq", N), lambda: self.createDRSEQTable(N))
+        if slot < 0:
+            return table
+
+        c = table[slot % len(table)]
+        if c < 0:
             # empty slot e, return random channel
-            return np.random.randint(0, self.N)
-        else:
-            # return ID in decreasing order
-            #print slot
-            return (2*N-slot) % N
+            return self.rng.randint(0, self.N)
+        return c
+
+    def createDRSEQTable(self, N):
+        self.trace("N: %d", N)
+        # IDs in increasing order, the empty slot e marked with -1 and
+        # IDs in decreasing order
+        return np.concatenate([np.arange(N), [-1], np.arange(N - 1, -1, -1)])
 
 # Shin et al. "A Channel Rendezvous Scheme for Cognitive Radio Networks"
 class CRSeqRendezvous(Rendezvous):
-    def __init__(self, channelset, verbose):
-        Rendezvous.__init__(self, "CRSEQ", channelset, verbose)
+    def __init__(self, channelset, verbose, rng=np.random):
+        Rendezvous.__init__(self, "CRSEQ", channelset, verbose, rng)
         # initialize algorithm
         self.P = getNextPrime(self.N)
         self.t = 0 # current time slot
-        self.trace("self.N: %d" % self.N)
-        self.trace("self.P: %d" % self.P)
+        self.trace("self.N: %d", self.N)
+        self.trace("self.P: %d", self.P)
         #self.test2()
 
     # Simple functional test using the parameter given in the paper
@@ -389,45 +563,57 @@ class CRSeqRendezvous(Rendezvous):
     def getNextChannel(self):
         c = self.CRSEQHopping(self.N, self.P, self.t)
         self.t += 1
-        self.trace("Next channel index: %d" % c)
+        self.trace("Next channel index: %d", c)
         #return c
-        return (self.channelset.getChannelByIndex(c))
-
-    def CRSEQHopping(self, N, P, slot):
-        self.trace("-----")
-        self.trace("N: %d" % N)
-        self.trace("P: %d" % P)
-        self.trace("Slot: %d" % slot)
+        return (self.channelset.getChannelIdByIndex(c))
+
+    def getNextChannels(self, k):
+        table = period_tables.get(("crseq", self.N, self.P), lambda: self.createCRSEQTable(self.N, self.P))
+        c = table[(self.t + np.arange(k)) % len(table)]
+        self.t += k
+        return self.getChannelIds()[c]
+
+    def advance(self, k):
+        self.t += k
+
+    def getSchedule(self):
+        ids = np.array(self.channelset.getChannelIdsAsList())
+        return ids[self.CRSEQHopping(self.N, self.P)]
+
+    def getPeriod(self):
+        return self.P * (3 * self.P - 1)
+
+    # Return channel index for given slot, return the whole period otherwise
+    def CRSEQHopping(self, N, P, slot=-1):
+        table = period_tables.get(("crseq", N, P), lambda: self.createCRSEQTable(N, P))
+        if slot < 0:
+            return table
+        return table[slot % len(table)]
+
+    def createCRSEQTable(self, N, P):
+        self.trace("N: %d", N)
+        self.trace("P: %d", P)
         maxSeqLen = P * (3 * P - 1)
-        self.trace("maxSeqLen: %d" % maxSeqLen)
+        self.trace("maxSeqLen: %d", maxSeqLen)
         maxSubSeqLen = 3 * P - 1 # subsequence length
-        self.trace("maxSubSeqLen: %d" % maxSubSeqLen)
+        self.trace("maxSubSeqLen: %d", maxSubSeqLen)
 
-        slot = slot % maxSeqLen
-        self.trace("newslot: %d" % slot)
-        
+        slot = np.arange(maxSeqLen)
         subSeqSlot = slot % maxSubSeqLen
-        self.trace("subSeqSlot: %d" % subSeqSlot)
-
-        j = int(np.floor(slot / maxSubSeqLen)) # subsequence that we are in
-        self.trace("j: %d" % j)
+        j = slot // maxSubSeqLen # subsequence that we are in
         
         # Calculate T_j (or T_n as called in the paper)
-        Tj = ((j * (j + 1) / 2) + subSeqSlot) % P
-        self.trace("Tj: %d" % Tj)
+        Tj = ((j * (j + 1) // 2) + subSeqSlot) % P
         
-        if subSeqSlot < (2 * P - 1):
-            return Tj % N
-        else:
-            return j % N
+        return np.where(subSeqSlot < (2 * P - 1), Tj % N, j % N)
 
 
 
 # Base class for all Exhaustive Search variants
 # Kondareddy et al. "Cognitive Radio Network setup without a Common Control Channel"
 class ExhaustiveSearch(Rendezvous):
-    def __init__(self, name, node_id, channelset, verbose=True):
-        Rendezvous.__init__(self, name, channelset, verbose)
+    def __init__(self, name, node_id, channelset, verbose=True, rng=np.random):
+        Rendezvous.__init__(self, name, channelset, verbose, rng)
         self.isMaster = False
         self.masterHoppingSequence = []
         self.slaveHoppingSequence = []
@@ -448,16 +634,37 @@ class ExhaustiveSearch(Rendezvous):
         else:
             return self.getNextChannelSlave()
 
+    def getNextChannels(self, k):
+        t = self.t + 1 + np.arange(k)
+        self.t += k
+        if self.isMaster:
+            sequence = np.array(self.masterHoppingSequence)
+            index = t % len(sequence)
+            self.currentMasterIndex = self.t % len(sequence)
+        else:
+            # stay in each channel for N slots
+            sequence = np.array(self.slaveHoppingSequence)
+            index = (t // self.N) % len(sequence)
+            self.currentSlaveIndex = (self.t // self.N) % len(sequence)
+        return sequence[index]
+
+    def advance(self, k):
+        self.t += k
+        if self.isMaster:
+            self.currentMasterIndex = self.t % len(self.masterHoppingSequence)
+        else:
+            self.currentSlaveIndex = (self.t // self.N) % len(self.slaveHoppingSequence)
+
             
     def getNextChannelMaster(self):
         # Choose new channel in each slot and iterate through available 
         # channels, starting with lowest index
         sequence_len = len(self.masterHoppingSequence)
         self.currentMasterIndex = (self.currentMasterIndex + 1) % sequence_len
-        self.trace("masterChannel: %d" % self.currentMasterIndex)
+        self.trace("masterChannel: %d", self.currentMasterIndex)
         
         channelId = self.masterHoppingSequence[self.currentMasterIndex]
-        return self.channelset.getChannelById(channelId)
+        return channelId
 
         
     def getNextChannelSlave(self):
@@ -469,17 +676,30 @@ class ExhaustiveSearch(Rendezvous):
         sequence_len = len(self.slaveHoppingSequence)
         if (self.t % self.N) == 0:
             self.currentSlaveIndex = (self.currentSlaveIndex + 1) % sequence_len
-            self.trace("Update master channel, id is: %d" % self.slaveHoppingSequence[self.currentSlaveIndex])
+            self.trace("Update master channel, id is: %d", self.slaveHoppingSequence[self.currentSlaveIndex])
         
         channelId = self.slaveHoppingSequence[self.currentSlaveIndex]
-        return self.channelset.getChannelById(channelId)
+        return channelId
+
+
+    def getSchedule(self):
+        if self.isMaster:
+            # a new channel in each slot
+            return np.array(self.masterHoppingSequence)
+        else:
+            # stay in each channel for N slots
+            return np.repeat(self.slaveHoppingSequence, self.N)
+
+    def getPeriod(self):
+        if self.isMaster:
+            return len(self.masterHoppingSequence)
+        else:
+            return self.N * len(self.slaveHoppingSequence)
 
 
     def getSortedListById(self, channelset, reverse=False):
         # iterate through channels, add indices to sorted list
-        unsort_list = []
-        for i in range(channelset.getNumChannels()):
-            unsort_list.append(channelset.getChannelByIndex(i).getId())
+        unsort_list = channelset.getChannelIdsAsList()
         return sorted(unsort_list, reverse=reverse)
 
 
@@ -490,7 +710,7 @@ class ExhaustiveSearch(Rendezvous):
         current_gap_size = 1
         for i in range(channelset.getNumChannels()):
             #print "id at pos %d: %d" % (i, channelset.getChannelByIndex(i).getId())
-            current_id = channelset.getChannelByIndex(i).getId()
+            current_id = channelset.getChannelIdByIndex(i)
             #print "current_id: %d" % current_id
             #print "last_id: %d" % last_id
             if current_id == (last_id + 1):
@@ -527,7 +747,7 @@ class ExhaustiveSearch(Rendezvous):
             #print channel_dict[key]
             for idlist in channel_dict[key]:
                 for id in idlist: 
-                    target.append(channelset.getChannelById(id).getId())
+                    target.append(id)
         
         #print "-----------"
         #print channel_dict
@@ -536,13 +756,13 @@ class ExhaustiveSearch(Rendezvous):
 
     def getRandomList(self, channelset):
         lst = self.channelset.getChannelIdsAsList()       
-        return np.random.permutation(lst).tolist()
+        return self.rng.permutation(lst).tolist()
 
 
 # A randomized, but exhaustive version
 class RandomizedExhaustiveSearch(ExhaustiveSearch):
-    def __init__(self, node_id, channels, verbose):
-        ExhaustiveSearch.__init__(self, "REX", node_id, channels, verbose)
+    def __init__(self, node_id, channels, verbose, rng=np.random):
+        ExhaustiveSearch.__init__(self, "REX", node_id, channels, verbose, rng)
 
         if self.isMaster:
             self.masterHoppingSequence = self.getRandomList(channels)
@@ -552,8 +772,8 @@ class RandomizedExhaustiveSearch(ExhaustiveSearch):
 
 # Four heuristically guided variants
 class LowestIdFirstExhaustiveSearch(ExhaustiveSearch):
-    def __init__(self, node_id, channels, verbose):
-        ExhaustiveSearch.__init__(self, "LIDFEX", node_id, channels, verbose)
+    def __init__(self, node_id, channels, verbose, rng=np.random):
+        ExhaustiveSearch.__init__(self, "LIDFEX", node_id, channels, verbose, rng)
 
         # Sort channels in accending order according to channel ID (normal EX algorithm)
         if self.isMaster:
@@ -567,8 +787,8 @@ class LowestIdFirstExhaustiveSearch(ExhaustiveSearch):
 
 
 class HighestIdFirstExhaustiveSearch(ExhaustiveSearch):
-    def __init__(self, node_id, channels, verbose):
-        ExhaustiveSearch.__init__(self, "HIDFEX", node_id, channels, verbose)
+    def __init__(self, node_id, channels, verbose, rng=np.random):
+        ExhaustiveSearch.__init__(self, "HIDFEX", node_id, channels, verbose, rng)
 
         # Sort channels in decending order according to channel ID
         if self.isMaster:
@@ -578,8 +798,8 @@ class HighestIdFirstExhaustiveSearch(ExhaustiveSearch):
 
 
 class SmallestGapFirstExhaustiveSearch(ExhaustiveSearch):
-    def __init__(self, node_id, channels, verbose):
-        ExhaustiveSearch.__init__(self, "SGFEX", node_id, channels, verbose)
+    def __init__(self, node_id, channels, verbose, rng=np.random):
+        ExhaustiveSearch.__init__(self, "SGFEX", node_id, channels, verbose, rng)
 
         # Sort channels in accending order according to gap size
         if self.isMaster:
@@ -593,8 +813,8 @@ class SmallestGapFirstExhaustiveSearch(ExhaustiveSearch):
 
 
 class LargestGapFirstExhaustiveSearch(ExhaustiveSearch):
-    def __init__(self, node_id, channels, verbose):
-        ExhaustiveSearch.__init__(self, "LGFEX", node_id, channels, verbose)
+    def __init__(self, node_id, channels, verbose, rng=np.random):
+        ExhaustiveSearch.__init__(self, "LGFEX", node_id, channels, verbose, rng)
 
         # Sort channels in decending order according to gap size
         if self.isMaster:
@@ -604,8 +824,8 @@ class LargestGapFirstExhaustiveSearch(ExhaustiveSearch):
 
 
 class EvenOddFirstExhaustiveSearch(ExhaustiveSearch):
-    def __init__(self, node_id, channels, verbose):
-        ExhaustiveSearch.__init__(self, "EOFEX", node_id, channels, verbose)
+    def __init__(self, node_id, channels, verbose, rng=np.random):
+        ExhaustiveSearch.__init__(self, "EOFEX", node_id, channels, verbose, rng)
 
         # Sort channels in decending order according to gap size
         if self.isMaster:
@@ -0,0 +1,376 @@
+#!/usr/bin/env python
+#
+# This file is part of RendezvousSim. RendezvousSim is free software: you can
+# redistribute it and/or modify it under the terms of the GNU General Public
+# License as published by the Free Software Foundation, version 2.
+#
+# This program is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE.  See the GNU General Public License for more
+# details.
+#
+# You should have received a copy of the GNU General Public License along with
+# this program; if not, write to the Free Software Foundation, Inc., 51
+# Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+#
+# Copyright 2014 Andre Puschmann <andre.puschmann@tu-ilmenau.de>
+
+"""
+Benchmarks of the simulator. The results are written as JSON, so runs of
+different commits on the same machine can be compared with --compare.
+
+ Suites:
+ algorithms     slots per second of getNextChannel(), getNextChannels() and advance()
+                of both nodes of every rendezvous algorithm, so that the master and
+                the slave of the EX variants are measured separately
+ environment    seconds per Environment.initialize() for M from 5 to 1000 in both channel models
+ end_to_end     seconds of the sweeps of run_symmetric.py and run_asymmetric.py, without cache
+ startup        seconds to import each command line tool in a new interpreter
+ analytic       seconds of the analytic and the simulated TTR of the random
+                algorithm, and whether their distributions agree
+
+Every measurement is repeated and the fastest repetition is reported, all
+random numbers are drawn from streams derived from a fixed seed.
+
+The startup time of a tool is measured after numpy is imported, which every
+tool needs and which dominates its startup. A tool fails its startup budget if
+it takes longer than --startup-budget or if it imports one of LAZY_MODULES,
+which must only be imported once they are used. The benchmark then exits with
+status 1, as it does if the TTR of the random algorithm sampled with
+--analytic-random fails a two-sample Kolmogorov-Smirnov test against the TTR
+simulated by the batch engine, in any channel model of ANALYTIC_MODELS.
+
+ Example:
+ $ ./benchmark.py -o before.json
+ $ ./benchmark.py -o after.json --compare before.json
+"""
+
+import os
+import sys
+import json
+import time
+import platform
+import subprocess
+import numpy as np
+from optparse import OptionParser
+from environment import Environment
+from simulation import Config,simulate,MODELS,RANDOM_SEED
+from cache import getCodeVersion
+from helper import createRandomState,string_splitter
+from registry import getAlgorithmNames
+from sweep import sweep
+import run_symmetric
+import run_asymmetric
+
+SUITES = ['algorithms', 'environment', 'end_to_end', 'startup', 'analytic']
+
+ALGORITHMS = getAlgorithmNames()
+ALGORITHM_CHANNELS = [20, 80]
+ALGORITHM_METHODS = ['getNextChannel', 'getNextChannels', 'advance']
+ALGORITHM_BLOCK_SIZE = 1024 # slots per call of getNextChannels()
+ENVIRONMENT_CHANNELS = [5, 10, 20, 50, 100, 200, 500, 1000]
+SCENARIOS = [('symmetric', run_symmetric), ('asymmetric', run_asymmetric)]
+
+STARTUP_TOOLS = ['rendezvoussim2', 'sweep', 'plot_results', 'resultstore']
+STARTUP_BUDGET = 0.05 # seconds
+LAZY_MODULES = ['algorithms', 'matplotlib', 'pylab', 'multiprocessing']
+
+# Channel models (model, M, G, theta, acdp) in which the analytic TTR is checked
+ANALYTIC_MODELS = [('symmetric', 10, 10, 1.0, 0.0),
+                   ('asymmetric', 20, 4, 0.5, 0.0),
+                   ('asymmetric', 20, 4, 0.5, 0.5)]
+ANALYTIC_ITERATIONS = 5000
+KS_CRITICAL_VALUE = 1.95 # two-sample Kolmogorov-Smirnov test at a significance level of 0.001
+
+# Run in a new interpreter, prints the import time of a tool and the lazy
+# modules it imported as JSON
+STARTUP_SCRIPT = """
+import sys, time, json
+import numpy
+start = time.time()
+import %s
+print json.dumps({'seconds': time.time() - start, 'loaded': [name for name in %r if name in sys.modules]})
+"""
+
+# Channel model of the asymmetric environments, G is a tenth of M
+ASYMMETRIC_THETA = 0.5
+
+
+def createEnvironment(model, num_channels):
+    num_overlap_channels = num_channels
+    theta = 1.0
+    if model == 'asymmetric':
+        num_overlap_channels = max(1, num_channels // 10)
+        theta = ASYMMETRIC_THETA
+    return Environment(model, num_channels, num_overlap_channels, 2, theta, 1, False,
+                       createRandomState(RANDOM_SEED, "benchmark", model, num_channels))
+
+
+# Return master or slave for the EX variants, None for algorithms without roles
+def getRole(algorithm):
+    if not hasattr(algorithm, 'isMaster'):
+        return None
+    return 'master' if algorithm.isMaster else 'slave'
+
+
+# Step an algorithm over num_slots slots with the given method
+def stepAlgorithm(algorithm, method, num_slots):
+    if method == 'getNextChannel':
+        for k in xrange(num_slots):
+            algorithm.getNextChannel()
+    elif method == 'getNextChannels':
+        for k in xrange(0, num_slots, ALGORITHM_BLOCK_SIZE):
+            algorithm.getNextChannels(min(ALGORITHM_BLOCK_SIZE, num_slots - k))
+    else:
+        algorithm.advance(num_slots)
+
+
+# Time each method on the algorithm of each node, the nodes are created anew
+# for every repetition with the same random stream
+def benchmarkAlgorithms(num_slots, repeat):
+    results = []
+    for alg in ALGORITHMS:
+        for num_channels in ALGORITHM_CHANNELS:
+            env = createEnvironment('symmetric', num_channels)
+            env.initialize()
+            for node in range(len(env.getNodes())):
+                for method in ALGORITHM_METHODS:
+                    best = None
+                    for r in range(repeat):
+                        env.initializeNodes(alg, rng=createRandomState(RANDOM_SEED, "benchmark", alg))
+                        algorithm = env.getNodes()[node].getAlgorithm()
+                        start = time.time()
+                        stepAlgorithm(algorithm, method, num_slots)
+                        elapsed = time.time() - start
+                        best = elapsed if best is None else min(best, elapsed)
+                    results.append({'algorithm': alg,
+                                    'num_channels': num_channels,
+                                    'node': node,
+                                    'role': getRole(algorithm),
+                                    'method': method,
+                                    'slots': num_slots,
+                                    'seconds': best,
+                                    'slots_per_second': num_slots / best if best > 0 else None})
+    return results
+
+
+# Time the creation of new nodes and their channel sets from a drawn channel map
+def benchmarkEnvironment(num_calls, repeat):
+    results = []
+    for model in MODELS:
+        for num_channels in ENVIRONMENT_CHANNELS:
+            env = createEnvironment(model, num_channels)
+            best = None
+            for r in range(repeat):
+                start = time.time()
+                for k in xrange(num_calls):
+                    env.initialize()
+                elapsed = time.time() - start
+                best = elapsed if best is None else min(best, elapsed)
+            results.append({'model': model,
+                            'num_channels': num_channels,
+                            'calls': num_calls,
+                            'seconds': best,
+                            'seconds_per_call': best / num_calls})
+    return results
+
+
+# Run the sweeps of the run scripts with the given number of iterations per point
+def benchmarkEndToEnd(iterations, jobs, repeat):
+    results = []
+    for (name, script) in SCENARIOS:
+        config = script.CONFIG.copy(iterations=iterations, jobs=jobs, cache_dir=None)
+        best = None
+        for r in range(repeat):
+            start = time.time()
+            points = len(list(sweep(config, script.GRID)))
+            elapsed = time.time() - start
+            best = elapsed if best is None else min(best, elapsed)
+        results.append({'scenario': name,
+                        'iterations': iterations,
+                        'jobs': jobs,
+                        'points': points,
+                        'seconds': best})
+    return results
+
+
+# Import each tool in a new interpreter, the first run is not counted since
+# it may compile the tool
+def benchmarkStartup(repeat, budget):
+    results = []
+    for tool in STARTUP_TOOLS:
+        best = None
+        for r in range(repeat + 1):
+            output = subprocess.check_output([sys.executable, '-c', STARTUP_SCRIPT % (tool, LAZY_MODULES)],
+                                             cwd=os.path.dirname(os.path.abspath(__file__)))
+            measurement = json.loads(output)
+            if r > 0:
+                best = measurement['seconds'] if best is None else min(best, measurement['seconds'])
+        results.append({'tool': tool,
+                        'calls': 1,
+                        'seconds': best,
+                        'budget': budget,
+                        'lazy_modules_loaded': measurement['loaded'],
+                        'ok': best <= budget and not measurement['loaded']})
+    return results
+
+
+# Return the two-sample Kolmogorov-Smirnov statistic of the TTR histograms of
+# two monitors, scaled by the sample sizes so it compares to KS_CRITICAL_VALUE
+def getKSStatistic(monitor, other):
+    (values, counts) = monitor.histogram()
+    (other_values, other_counts) = other.histogram()
+    support = np.union1d(values, other_values)
+    cdf = np.cumsum(counts)[np.searchsorted(values, support, side='right') - 1] / float(counts.sum())
+    cdf[support < values[0]] = 0.0
+    other_cdf = np.cumsum(other_counts)[np.searchsorted(other_values, support, side='right') - 1] / float(other_counts.sum())
+    other_cdf[support < other_values[0]] = 0.0
+    (n, m) = (counts.sum(), other_counts.sum())
+    return np.abs(cdf - other_cdf).max() * np.sqrt(n * m / float(n + m))
+
+
+# Simulate the random algorithm in each channel model of ANALYTIC_MODELS with
+# the batch engine and with its analytic TTR, both from the fixed seed
+def benchmarkAnalytic(iterations):
+    results = []
+    for (model, num_channels, num_overlap_channels, theta, acdp) in ANALYTIC_MODELS:
+        config = Config(algorithms=['random'], model=model, num_channels=num_channels,
+                        num_overlap_channels=num_overlap_channels, theta=theta, acdp=acdp,
+                        iterations=iterations, engine='batch')
+        start = time.time()
+        simulated = simulate(config).getMonitor('random')
+        slot_seconds = time.time() - start
+        start = time.time()
+        analytic = simulate(config.copy(analytic_random=True)).getMonitor('random')
+        seconds = time.time() - start
+        statistic = getKSStatistic(simulated, analytic)
+        results.append({'model': model,
+                        'num_channels': num_channels,
+                        'num_overlap_channels': num_overlap_channels,
+                        'acdp': acdp,
+                        'iterations': iterations,
+                        'seconds': seconds,
+                        'slot_seconds': slot_seconds,
+                        'mean': analytic.mean(),
+                        'slot_mean': simulated.mean(),
+                        'ks_statistic': statistic,
+                        'ok': bool(statistic <= KS_CRITICAL_VALUE)})
+    return results
+
+
+# Return the fields that identify a result within its suite
+def getResultKey(result):
+    return tuple(sorted((key, value) for (key, value) in result.items()
+                        if key in ['algorithm', 'model', 'num_channels', 'num_overlap_channels', 'acdp',
+                                   'node', 'role', 'method', 'scenario', 'tool']
+                        and value is not None))
+
+
+# Return the time per slot, call or iteration of a result, which stays
+# comparable if the number of them changes between runs
+def getTimePerUnit(result):
+    for unit in ['slots', 'calls', 'iterations']:
+        if unit in result:
+            return result['seconds'] / result[unit]
+
+
+# Return the human-readable lines of all results, with the ratio of the time
+# per unit of each result to the one of the same result in a previous run
+def formatResults(results, previous=None):
+    lines = []
+    for suite in SUITES:
+        if suite not in results:
+            continue
+        old = {}
+        if previous and suite in previous['results']:
+            old = dict((getResultKey(result), result) for result in previous['results'][suite])
+        lines.append("#%s" % suite)
+        for result in results[suite]:
+            key = getResultKey(result)
+            line = "%-72s%10.4f s" % (" ".join("%s=%s" % item for item in key), result['seconds'])
+            if result.get('slots_per_second'):
+                line += "\t%10.0f slots/s" % result['slots_per_second']
+            if key in old:
+                line += "\t%.2fx" % (getTimePerUnit(result) / getTimePerUnit(old[key]))
+            if 'budget' in result and result['seconds'] > result['budget']:
+                line += "\tover budget of %.3f s" % result['budget']
+            for name in result.get('lazy_modules_loaded', []):
+                line += "\timports %s" % name
+            if 'ks_statistic' in result:
+                line += "\tmean %.2f (slots %.2f)\tKS %.2f" % (result['mean'], result['slot_mean'], result['ks_statistic'])
+                if not result['ok']:
+                    line += "\tdistributions differ"
+            lines.append(line)
+    return lines
+
+
+def main():
+    usage = "usage: %prog [options]"
+    parser = OptionParser(usage)
+    parser.add_option("-s", "--suite", dest="suites", default=SUITES,
+                      help="Comma separated list of the suites to run (%s)" % ", ".join(SUITES),
+                      type='string', action='callback', callback=string_splitter)
+    parser.add_option("--slots", dest="slots", type="int", default=20000,
+                      help="How many slots to simulate per algorithm")
+    parser.add_option("--calls", dest="calls", type="int", default=100,
+                      help="How often to initialize each environment")
+    parser.add_option("-i", "--iterations", dest="iterations", type="int", default=1000,
+                      help="How many iterations to simulate per point of the end-to-end sweeps")
+    parser.add_option("-j", "--jobs", dest="jobs", type="int", default=1,
+                      help="How many worker processes to use in the end-to-end sweeps")
+    parser.add_option("-r", "--repeat", dest="repeat", type="int", default=3,
+                      help="How often to repeat each measurement, the fastest repetition is reported")
+    parser.add_option("--startup-budget", dest="startup_budget", type="float", default=STARTUP_BUDGET,
+                      help="How many seconds each tool may take to import after numpy")
+    parser.add_option("--analytic-iterations", dest="analytic_iterations", type="int", default=ANALYTIC_ITERATIONS,
+                      help="How many iterations to simulate per channel model in the check of the analytic TTR")
+    parser.add_option("-o", "--output", dest="output", metavar="FILE", default="benchmark.json",
+                      help="Write the results as JSON to FILE")
+    parser.add_option("--compare", dest="compare", metavar="FILE", default=None,
+                      help="Print the ratio of each time to the one in the results in FILE")
+    (options, args) = parser.parse_args()
+
+    for suite in options.suites:
+        if suite not in SUITES:
+            print "Benchmark suite %s not supported." % suite
+            sys.exit()
+    previous = None
+    if options.compare:
+        with open(options.compare) as f:
+            previous = json.load(f)
+
+    results = {}
+    if 'algorithms' in options.suites:
+        results['algorithms'] = benchmarkAlgorithms(options.slots, options.repeat)
+    if 'environment' in options.suites:
+        results['environment'] = benchmarkEnvironment(options.calls, options.repeat)
+    if 'end_to_end' in options.suites:
+        results['end_to_end'] = benchmarkEndToEnd(options.iterations, options.jobs, options.repeat)
+    if 'startup' in options.suites:
+        results['startup'] = benchmarkStartup(options.repeat, options.startup_budget)
+    if 'analytic' in options.suites:
+        results['analytic'] = benchmarkAnalytic(options.analytic_iterations)
+
+    for line in formatResults(results, previous):
+        print line
+    with open(options.output, 'w') as f:
+        json.dump({'code_version': getCodeVersion(),
+                   'date': time.strftime("%Y-%m-%d %H:%M:%S"),
+                   'machine': {'node': platform.node(),
+                               'processor': platform.processor() or platform.machine(),
+                               'python': platform.python_version(),
+                               'numpy': np.__version__},
+                   'options': {'slots': options.slots,
+                               'calls': options.calls,
+                               'iterations': options.iterations,
+                               'jobs': options.jobs,
+                               'repeat': options.repeat,
+                               'startup_budget': options.startup_budget,
+                               'analytic_iterations': options.analytic_iterations},
+                   'results': results}, f, indent=1, sort_keys=True)
+    if not all(result['ok'] for suite in ['startup', 'analytic'] for result in results.get(suite, [])):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,121 @@
+#
+# This file is part of RendezvousSim. RendezvousSim is free software: you can
+# redistribute it and/or modify it under the terms of the GNU General Public
+# License as published by the Free Software Foundation, version 2.
+#
+# This program is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE.  See the GNU General Public License for more
+# details.
+#
+# You should have received a copy of the GNU General Public License along with
+# this program; if not, write to the Free Software Foundation, Inc., 51
+# Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+#
+# Copyright 2014 Andre Puschmann <andre.puschmann@tu-ilmenau.de>
+
+"""
+Content-addressed cache of simulation results. Every algorithm draws its
+random numbers from its own streams, so the result of one algorithm at one
+sweep point doesn't depend on the other algorithms that are simulated with it.
+Results are therefore cached per algorithm, keyed by a hash of the config
+with only this algorithm, the seed, the number of iterations and the source
+code of the simulator. Changing any of them, or the contents of a replayed
+channel map corpus, leads to a new key.
+
+Each entry is a small JSON file holding the TTR histograms of the algorithm,
+the rows printed from them are identical to the ones of a new simulation.
+"""
+
+import os
+import json
+import hashlib
+
+DEFAULT_CACHE_DIR = ".rendezvoussim-cache"
+
+# Source files whose contents define the version of the simulator
+CODE_FILES = ['algorithms.py', 'engine.py', 'environment.py', 'helper.py', 'simulation.py', 'corpus.py', 'registry.py']
+
+# Config parameters that don't change the statistics
+IGNORED_PARAMETERS = ['algorithms', 'jobs', 'verbose', 'record_maps', 'replay_maps', 'raw_trials', 'cache_dir',
+                      'checkpoint', 'resume', 'trace_events', 'profile']
+
+code_version = None
+
+
+# Return a hash of the source code of the simulator
+def getCodeVersion():
+    global code_version
+    if code_version is None:
+        sha = hashlib.sha1()
+        for name in CODE_FILES:
+            with open(os.path.join(os.path.dirname(os.path.abspath(__file__)), name), 'rb') as f:
+                sha.update(f.read())
+        code_version = sha.hexdigest()
+    return code_version
+
+
+def getFileHash(filename):
+    sha = hashlib.sha1()
+    with open(filename, 'rb') as f:
+        for block in iter(lambda: f.read(2**20), b''):
+            sha.update(block)
+    return sha.hexdigest()
+
+
+# Return the key of the result of one algorithm simulated with the given config
+def getCacheKey(config, alg):
+    parameters = dict((key, value) for (key, value) in vars(config).items() if key not in IGNORED_PARAMETERS)
+    parameters['algorithm'] = alg
+    parameters['code_version'] = getCodeVersion()
+    if config.replay_maps:
+        parameters['replay_maps'] = getFileHash(config.replay_maps)
+    return hashlib.sha1(json.dumps(parameters, sort_keys=True)).hexdigest()
+
+
+# Return True if results of the config can be cached, i.e. the simulation is
+# deterministic and has no output besides the statistics
+def isCacheable(config):
+    return not (config.record_maps or config.raw_trials or config.trace_events or config.time_budget is not None)
+
+
+class ResultCache():
+    def __init__(self, dirname=DEFAULT_CACHE_DIR):
+        self.dirname = dirname
+
+    def getFilename(self, key):
+        return os.path.join(self.dirname, key[:2], key + '.json')
+
+    # Return the cached entry of the algorithm, or None
+    def get(self, config, alg):
+        filename = self.getFilename(getCacheKey(config, alg))
+        if not os.path.exists(filename):
+            return None
+        with open(filename) as f:
+            return json.load(f)
+
+    # Store the histograms of the TTR monitors of the algorithm
+    def put(self, config, alg, iterations, monitor, pair_monitor=None):
+        entry = {'iterations': iterations,
+                 'ttr': getHistogram(monitor),
+                 'pair_ttr': getHistogram(pair_monitor) if pair_monitor else None}
+        filename = self.getFilename(getCacheKey(config, alg))
+        if not os.path.isdir(os.path.dirname(filename)):
+            os.makedirs(os.path.dirname(filename))
+        # write to a temporary file first, so concurrent sweeps never read partial entries
+        with open(filename + '.%d.tmp' % os.getpid(), 'w') as f:
+            json.dump(entry, f)
+        os.rename(filename + '.%d.tmp' % os.getpid(), filename)
+
+
+# Return the histogram of a monitor as list of [value, count] pairs
+def getHistogram(monitor):
+    (values, counts) = monitor.histogram()
+    return [[value.item(), count.item()] for (value, count) in zip(values, counts)]
+
+
+# Tally a histogram stored by getHistogram() into an empty monitor
+def restoreHistogram(monitor, histogram):
+    for (value, count) in histogram:
+        monitor.tally(value, count)
+    return monitor
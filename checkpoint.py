@@ -0,0 +1,72 @@
+#
+# This file is part of RendezvousSim. RendezvousSim is free software: you can
+# redistribute it and/or modify it under the terms of the GNU General Public
+# License as published by the Free Software Foundation, version 2.
+#
+# This program is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE.  See the GNU General Public License for more
+# details.
+#
+# You should have received a copy of the GNU General Public License along with
+# this program; if not, write to the Free Software Foundation, Inc., 51
+# Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+#
+# Copyright 2014 Andre Puschmann <andre.puschmann@tu-ilmenau.de>
+
+"""
+Checkpoints of running simulations. The random streams of every iteration are
+derived from the seed, so the state of a simulation is completely described by
+the index of the next chunk, the TTR histograms collected so far and, for
+sequential stopping, the algorithms that still run. Resuming from a checkpoint
+gives the same statistics as an uninterrupted run.
+
+A checkpoint is a small JSON file that is replaced atomically. It belongs to
+the simulation whose config, seed and code version hash to its key, other
+simulations ignore it.
+"""
+
+import os
+import json
+from cache import getCacheKey,getHistogram,restoreHistogram
+
+CHECKPOINT_INTERVAL = 60.0 # seconds between two checkpoints
+
+
+class Checkpoint():
+    def __init__(self, filename, config):
+        self.filename = filename
+        self.key = getCacheKey(config, config.algorithms)
+
+    # Return the saved state of this simulation, or None if there is none.
+    # Monitors are restored into the monitors returned by create_monitor.
+    def load(self, create_monitor, create_pair_monitor):
+        if not os.path.exists(self.filename):
+            return None
+        with open(self.filename) as f:
+            state = json.load(f)
+        if state['key'] != self.key:
+            return None
+        state['active'] = [str(alg) for alg in state['active']]
+        state['iterations'] = dict((str(alg), n) for (alg, n) in state['iterations'].items())
+        for (name, create) in [('ttr', create_monitor), ('pair_ttr', create_pair_monitor)]:
+            if state[name] is not None:
+                state[name] = dict((str(alg), restoreHistogram(create(), histogram))
+                                   for (alg, histogram) in state[name].items())
+        return state
+
+    def save(self, cursor, active, iterations, ttr, pair_ttr, elapsed):
+        state = {'key': self.key,
+                 'cursor': cursor,
+                 'active': active,
+                 'iterations': iterations,
+                 'ttr': None,
+                 'pair_ttr': None,
+                 'elapsed': elapsed}
+        if ttr:
+            state['ttr'] = dict((alg, getHistogram(monitor)) for (alg, monitor) in ttr.items())
+        if pair_ttr:
+            state['pair_ttr'] = dict((alg, getHistogram(monitor)) for (alg, monitor) in pair_ttr.items())
+        with open(self.filename + '.tmp', 'w') as f:
+            json.dump(state, f)
+        os.rename(self.filename + '.tmp', self.filename)
@@ -0,0 +1,122 @@
+#!/usr/bin/env python
+#
+# This file is part of RendezvousSim. RendezvousSim is free software: you can
+# redistribute it and/or modify it under the terms of the GNU General Public
+# License as published by the Free Software Foundation, version 2.
+#
+# This program is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE.  See the GNU General Public License for more
+# details.
+#
+# You should have received a copy of the GNU General Public License along with
+# this program; if not, write to the Free Software Foundation, Inc., 51
+# Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+#
+# Copyright 2014 Andre Puschmann <andre.puschmann@tu-ilmenau.de>
+
+"""
+Binary corpus of channel maps. A corpus records the channel maps of a run so
+that other algorithms can be benchmarked on exactly the same maps later.
+
+ File layout:
+ magic           8 bytes, "RVSMAPS1"
+ header length   4 bytes, little endian
+ header          JSON object with the channel model parameters, padded with
+                 spaces to a multiple of 64 bytes
+ maps            one record per iteration, the availability of all nodes
+                 (nodes x M bits) packed with np.packbits
+
+The number of maps follows from the file size, so maps can be appended while
+the simulation runs. Calling this file directly prints the maps of a corpus as
+text, one line per channel: 1 for common channels, 0.66 or 0.33 for channels
+of the first or second node only and 0 otherwise. With more than two nodes,
+the line holds the share of nodes that have the channel.
+"""
+
+import sys
+import json
+import numpy as np
+from helper import writeBinaryHeader,readBinaryHeader
+
+MAGIC = "RVSMAPS1"
+
+# Channel model parameters stored in the header
+PARAMETERS = ['model', 'num_channels', 'num_overlap_channels', 'num_nodes', 'theta', 'block_width']
+
+
+# Appends channel maps to a new corpus file
+class ChannelMapWriter():
+    def __init__(self, filename, parameters):
+        self.filename = filename
+        self.parameters = dict((key, parameters[key]) for key in PARAMETERS)
+        self.file = open(filename, 'wb')
+        writeBinaryHeader(self.file, MAGIC, self.parameters)
+        self.num_maps = 0
+
+    # Append maps that are already packed, see packChannelMaps()
+    def appendPacked(self, packed):
+        packed.tofile(self.file)
+        self.num_maps += packed.shape[0]
+
+    def close(self):
+        self.file.close()
+
+
+# Read-only, memory-mapped access to the maps of a corpus file
+class ChannelMapCorpus():
+    def __init__(self, filename):
+        self.filename = filename
+        (self.parameters, data_offset) = readBinaryHeader(filename, MAGIC, "a channel map corpus")
+
+        self.num_nodes = self.parameters['num_nodes']
+        self.num_channels = self.parameters['num_channels']
+        self.map_size = (self.num_nodes * self.num_channels + 7) // 8
+        self.maps = np.memmap(filename, dtype=np.uint8, mode='r', offset=data_offset)
+        self.num_maps = self.maps.size // self.map_size
+        self.maps = self.maps[:self.num_maps * self.map_size].reshape(self.num_maps, self.map_size)
+
+    def getParameters(self):
+        return dict(self.parameters)
+
+    def len(self):
+        return self.num_maps
+
+    # Return the maps with the given indices as boolean array of shape (maps, nodes, channels)
+    def getMaps(self, indices):
+        indices = np.asarray(indices)
+        if indices.size and indices.max() >= self.num_maps:
+            raise ValueError("Corpus %s only holds %d channel maps." % (self.filename, self.num_maps))
+        bits = np.unpackbits(self.maps[indices], axis=1)[:, :self.num_nodes * self.num_channels]
+        return bits.reshape(-1, self.num_nodes, self.num_channels).astype(bool)
+
+
+def packChannelMaps(maps):
+    return np.packbits(maps.reshape(maps.shape[0], -1), axis=1)
+
+
+# Return the state of each channel of a map, see file description
+def getChannelStates(channel_map):
+    if channel_map.shape[0] != 2:
+        return channel_map.mean(axis=0)
+    states = np.zeros(channel_map.shape[1])
+    states[channel_map[0] & ~channel_map[1]] = 0.66
+    states[channel_map[1] & ~channel_map[0]] = 0.33
+    states[channel_map[0] & channel_map[1]] = 1
+    return states
+
+
+def main():
+    if len(sys.argv) != 2:
+        print "usage: %s CORPUS" % sys.argv[0]
+        sys.exit()
+    corpus = ChannelMapCorpus(sys.argv[1])
+    print '# %s' % json.dumps(corpus.getParameters(), sort_keys=True)
+    print '# In line in this file corresponds to the state of a channel, please see corpus.py for details.'
+    for i in range(corpus.len()):
+        print '# Next iteration'
+        np.savetxt(sys.stdout, getChannelStates(corpus.getMaps([i])[0]), fmt='%-.2f')
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,491 @@
+#
+# This file is part of RendezvousSim. RendezvousSim is free software: you can
+# redistribute it and/or modify it under the terms of the GNU General Public
+# License as published by the Free Software Foundation, version 2.
+#
+# This program is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE.  See the GNU General Public License for more
+# details.
+#
+# You should have received a copy of the GNU General Public License along with
+# this program; if not, write to the Free Software Foundation, Inc., 51
+# Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+#
+# Copyright 2014 Andre Puschmann <andre.puschmann@tu-ilmenau.de>
+
+import numpy as np
+from helper import lcm,createRandomState
+from profiler import NullProfiler
+
+MAX_SLOTS = 39999
+ASYNC_NODE = 1 # Always let Node 1 start first to make sure this is the Master in centralized mode
+CHUNK_SIZE = 100 # iterations are simulated in chunks of this size, independent of the number of jobs
+BLOCK_SIZE = 16 # slots of the first block of a trial, each further block is twice as long
+MAX_BLOCK_ELEMENTS = 2**20 # limit of the channels of all nodes and trials in one block
+ANALYTIC_ALGORITHM = 'random' # algorithm whose TTR can be sampled, see sampleRandomTTR()
+
+
+# Return the channel maps of the given iterations, drawn at once from a stream
+# derived from the first iteration or read from the corpus of the environment
+def drawChannelMaps(env, seed, iterations):
+    return env.getChannelMaps(iterations, createRandomState(seed, "maps", iterations[0]))
+
+
+# Return the random generators of the nodes of a trial. Every node draws from
+# its own stream, so its channels don't depend on how the slots of the nodes
+# are interleaved, e.g. if they are taken in blocks.
+def createNodeRandomStates(seed, iteration, alg, num_nodes):
+    return [createRandomState(seed, iteration, alg, n) for n in range(num_nodes)]
+
+
+# Return the number of slots that each node of a trial runs before the trial
+# starts. Node 1 starts async_slots slots before node 0, in groups of more than
+# two nodes every further node starts at a random slot in between, so node 1
+# always starts first.
+def drawStartOffsets(rng, async_slots, num_nodes):
+    offsets = np.zeros(num_nodes, dtype=int)
+    offsets[ASYNC_NODE] = async_slots
+    if num_nodes > 2:
+        offsets[2:] = rng.randint(0, async_slots, size=num_nodes - 2)
+    return offsets
+
+
+# Return the number of slots after which the nodes of a trial can't meet
+# anymore. If the algorithms of all nodes are periodic, the joint state of the
+# nodes repeats after the lcm of their periods, so a trial that hasn't met by
+# then never will. Otherwise trials are given up after MAX_SLOTS.
+def getSlotLimit(algorithms):
+    periods = [algorithm.getPeriod() for algorithm in algorithms]
+    if None in periods:
+        return MAX_SLOTS
+    return min(MAX_SLOTS, lcm(periods))
+
+
+# Return which slots of a block of channels with shape (..., nodes, slots) all
+# nodes have selected the same channel in, and which slots they have selected
+# direct neighbors in
+def getMeetings(channels):
+    met = (channels == channels[..., :1, :]).all(axis=-2)
+    neighbor = channels.max(axis=-2) - channels.min(axis=-2) == 1
+    return (met, neighbor)
+
+
+# Return which slots of a block of channels with shape (..., nodes, slots) any
+# two nodes have selected the same channel in
+def getPairMeetings(channels):
+    ordered = np.sort(channels, axis=-2)
+    return (ordered[..., 1:, :] == ordered[..., :-1, :]).any(axis=-2)
+
+
+# Return the probability that the nodes of the random algorithm meet in a
+# slot, and the probability that they select direct neighbors, for channel maps
+# of shape (trials, nodes, channels). Each node selects each of its channels
+# with the same probability.
+def getRandomMeetingProbabilities(maps):
+    p = maps / maps.sum(axis=2, keepdims=True).astype(float)
+    meet = p.prod(axis=1).sum(axis=1)
+    # all nodes on channel c or c+1, but not all on the same
+    lower = p[:, :, :-1]
+    upper = p[:, :, 1:]
+    neighbor = ((lower + upper).prod(axis=1) - lower.prod(axis=1) - upper.prod(axis=1)).sum(axis=1)
+    return (meet, neighbor)
+
+
+# Draw the TTR of one trial of the random algorithm from the probabilities of
+# getRandomMeetingProbabilities(), or None if the nodes don't meet within
+# MAX_SLOTS. All slots are independent, so the slot of the first meeting or
+# detected neighbor is geometric, the TTR of a neighbor detection is three
+# slots later like in the slot by slot simulation.
+def sampleRandomTTR(rng, meet, neighbor, neighbordetect):
+    q = meet + neighbor if neighbordetect else meet
+    slot = rng.geometric(q)
+    is_meeting = rng.random_sample() * q < meet
+    if slot > MAX_SLOTS:
+        return None
+    if is_meeting:
+        return slot
+    return slot + 3
+
+
+# Tally each distinct value with the number of its occurrences
+def tallyValues(monitor, values):
+    (values, counts) = np.unique(values, return_counts=True)
+    for (value, count) in zip(values, counts):
+        monitor.tally(int(value), int(count))
+
+
+# Settings shared by all engines, each engine simulates the given iterations
+# of the given algorithms with run()
+class Engine():
+    name = "Engine"
+
+    def __init__(self, env, seed, acdp=0.0, has_random_replace=False, verbose=True, trials=None, events=None,
+                 profiler=None, analytic_random=False):
+        self.env = env
+        self.seed = seed
+        self.acdp = acdp
+        self.has_random_replace = has_random_replace
+        self.verbose = verbose
+        self.trials = trials # TrialLog that receives the record of each trial, or None
+        self.events = events # EventLog that receives the channels of all nodes in every slot, or None
+        self.profiler = profiler or NullProfiler()
+        self.analytic_random = analytic_random # sample the TTR of the random algorithm, see sampleRandomTTR()
+
+    def trace(self, message='', *args):
+        if self.verbose: print "%s:\t%s" % (self.name, message % args if args else message)
+
+
+# The classic engine, simulates one trial after another. The channels of all
+# nodes are taken in blocks of slots, the first meeting in a block is found
+# with argmax.
+class SlotEngine(Engine):
+    name = "SlotEngine"
+
+    def run(self, algorithms, iterations, ttr, channel_maps=None, pair_ttr=None):
+        num_channels = self.env.max_num_channels
+        if channel_maps is None:
+            channel_maps = drawChannelMaps(self.env, self.seed, iterations)
+        profiler = self.profiler
+        for (i, run) in enumerate(iterations):
+            # reinitialize in each iteration (causes creation of new nodes)
+            start = profiler.start()
+            rng = createRandomState(self.seed, run)
+            self.env.initialize(rng, channel_maps[i])
+            profiler.stop(start, 'environment')
+
+            nodes = self.env.getNodes()
+
+            # Start rendezvous asynchronously, select node and number of iterations randomly
+            async_slots = rng.randint(1, num_channels * num_channels)
+
+            # Draw a random number that decides whether beacons on a neighbor channel can be detected
+            neighbordetect_random = rng.random_sample()
+            offsets = drawStartOffsets(rng, async_slots, len(nodes))
+
+            # Evaluate each algorithm using the same environment
+            for alg in algorithms:
+                if self.analytic_random and alg == ANALYTIC_ALGORITHM:
+                    start = profiler.start()
+                    (meet, neighbor) = getRandomMeetingProbabilities(np.asarray(channel_maps[i])[None])
+                    result = sampleRandomTTR(createRandomState(self.seed, run, alg), meet[0], neighbor[0],
+                                             neighbordetect_random <= self.acdp)
+                    if result is not None:
+                        ttr[alg].tally(result)
+                    profiler.stop(start, 'analytic', alg)
+                    if self.trials is not None:
+                        self.trials.append(run, alg, result or MAX_SLOTS, async_slots, result is not None)
+                    continue
+
+                # Initialize nodes with actual algorithm
+                start = profiler.start()
+                self.env.initializeNodes(alg, self.has_random_replace, rng=createNodeRandomStates(self.seed, run, alg, len(nodes)))
+                profiler.stop(start, 'initialize_nodes', alg)
+
+                # asynchronous start
+                start = profiler.start()
+                for (node, offset) in zip(nodes, offsets):
+                    if offset:
+                        node.getAlgorithm().advance(offset)
+                profiler.stop(start, 'async_start', alg, offsets.sum())
+
+                start = profiler.start()
+                limit = getSlotLimit([node.getAlgorithm() for node in nodes])
+                result = None
+                paired = pair_ttr is None
+                selected = []
+                slot = 1 # first slot of the next block
+                size = BLOCK_SIZE
+                simulated = 0
+                # Give up once the nodes can't meet anymore, at the latest after MAX_SLOTS
+                while result is None and slot <= limit:
+                    # For each node, get selected channels in the next k slots
+                    k = min(size, limit - slot + 1, MAX_BLOCK_ELEMENTS // len(nodes))
+                    channels = np.array([node.getNextChannels(k, slot) for node in nodes])
+
+                    # Check if all nodes have selected the same channel, or
+                    # direct neighbors, which are only detected with a certain probability
+                    (met, neighbor) = getMeetings(channels)
+                    event = met
+                    if neighbordetect_random <= self.acdp:
+                        event = met | neighbor
+                    # FIXME: take probability of false alarm into account here
+
+                    # the slots up to the first meeting are simulated
+                    n = event.argmax() + 1 if event.any() else k
+                    simulated += n
+                    if self.events is not None:
+                        selected.append(channels[:, :n].T)
+
+                    # Check if any two nodes have selected the same channel
+                    if not paired:
+                        pair = getPairMeetings(channels[:, :n])
+                        if pair.any():
+                            pair_ttr[alg].tally(slot + pair.argmax())
+                            paired = True
+
+                    if event.any():
+                        result = slot + n - 1
+                        if not met[n - 1]:
+                            # assume rendezvous has happened on two adjacent channels
+                            # in the next slot, but for fairness add two more slots that are
+                            # needed to beacon on upper and lower neighbor (worst case)
+                            result += 3
+                        ttr[alg].tally(result)
+                    slot += k
+                    size *= 2
+
+                profiler.stop(start, 'slots', alg, simulated)
+
+                if self.events is not None:
+                    self.events.extend(run, alg, np.arange(1, simulated + 1), np.concatenate(selected))
+                if self.trials is not None:
+                    self.trials.append(run, alg, result or MAX_SLOTS, async_slots, result is not None)
+
+
+# Simulates all trials at once. The channels selected by each node in every
+# trial are kept in an array of shape (trials, nodes, slots), all trials that
+# are still searching are advanced one block of slots at a time and retired as
+# soon as they meet. As each trial draws its random numbers from its own stream, the
+# results are identical to the SlotEngine.
+class BatchEngine(Engine):
+    name = "BatchEngine"
+
+    def run(self, algorithms, iterations, ttr, channel_maps=None, pair_ttr=None):
+        num_channels = self.env.max_num_channels
+        num_nodes = self.env.num_nodes
+        num_iterations = len(iterations)
+
+        # Create the environment of all trials up front and keep the
+        # channel availability of each node as boolean mask
+        profiler = self.profiler
+        start = profiler.start()
+        trials = []
+        available = channel_maps
+        if available is None:
+            available = drawChannelMaps(self.env, self.seed, iterations)
+        async_slots = np.zeros(num_iterations, dtype=int)
+        neighbordetect_random = np.zeros(num_iterations)
+        offsets = np.zeros((num_iterations, num_nodes), dtype=int)
+        for (run, iteration) in enumerate(iterations):
+            rng = createRandomState(self.seed, iteration)
+            self.env.initialize(rng, available[run])
+            trials.append(self.env.getNodes())
+            async_slots[run] = rng.randint(1, num_channels * num_channels)
+            neighbordetect_random[run] = rng.random_sample()
+            offsets[run] = drawStartOffsets(rng, async_slots[run], num_nodes)
+        neighbordetect = neighbordetect_random <= self.acdp
+        node_index = np.arange(num_nodes)
+        profiler.stop(start, 'environment')
+
+        for alg in algorithms:
+            if self.analytic_random and alg == ANALYTIC_ALGORITHM:
+                self.runAnalytic(alg, iterations, ttr, available, async_slots, neighbordetect)
+                continue
+
+            start = profiler.start()
+            algs = []
+            for (run, iteration) in enumerate(iterations):
+                self.env.initializeNodes(alg, self.has_random_replace, trials[run],
+                                         createNodeRandomStates(self.seed, iteration, alg, num_nodes))
+                algs.append([node.getAlgorithm() for node in trials[run]])
+            profiler.stop(start, 'initialize_nodes', alg)
+
+            # asynchronous start
+            start = profiler.start()
+            for (run, n) in np.argwhere(offsets):
+                algs[run][n].advance(offsets[run, n])
+            profiler.stop(start, 'async_start', alg, offsets.sum())
+
+            start = profiler.start()
+            limit = np.array([getSlotLimit(algs[run]) for run in range(num_iterations)])
+            simulated = 0
+            active = np.arange(num_iterations)
+            result = np.zeros(num_iterations, dtype=int)
+            paired = np.zeros(num_iterations, dtype=bool)
+            slot = 1 # first slot of the next block
+            size = BLOCK_SIZE
+            while active.size:
+                k = min(size, limit[active].max() - slot + 1, max(1, MAX_BLOCK_ELEMENTS // (active.size * num_nodes)))
+                # Channel ids of each node in the next k slots of all active trials, shape (trials, nodes, slots)
+                current = np.array([[a.getNextChannels(k) for a in algs[run]] for run in active])
+
+                # check validity
+                valid = available[active[:, None, None], node_index[None, :, None], current]
+                if not valid.all():
+                    (run, n, t) = np.argwhere(~valid)[0]
+                    raise RuntimeError("Node %s doesn't have channel with id: %d" % (trials[active[run]][n].name, current[run, n, t]))
+
+                # Trials where all nodes have selected the same channel or,
+                # if detected, direct neighbors, see SlotEngine. Slots beyond
+                # the limit of a trial are not part of it.
+                (met, neighbor) = getMeetings(current)
+                inside = slot + np.arange(k) <= limit[active][:, None]
+                event = (met | (neighbor & neighbordetect[active][:, None])) & inside
+                hit = event.any(axis=1)
+                first = event.argmax(axis=1)
+
+                # the slots up to the first meeting are simulated
+                n = np.where(hit, first + 1, inside.sum(axis=1))
+                simulated += n.sum()
+                if self.events is not None:
+                    for (j, run) in enumerate(active):
+                        self.events.extend(iterations[run], alg, slot + np.arange(n[j]), current[j, :, :n[j]].T)
+
+                # Trials where any two nodes have selected the same channel for the first time
+                if pair_ttr is not None:
+                    pair = getPairMeetings(current) & (np.arange(k) < n[:, None])
+                    found = pair.any(axis=1) & ~paired[active]
+                    tallyValues(pair_ttr[alg], slot + pair.argmax(axis=1)[found])
+                    paired[active[found]] = True
+
+                rows = np.flatnonzero(hit)
+                values = slot + first[rows] + np.where(met[rows, first[rows]], 0, 3)
+                tallyValues(ttr[alg], values)
+                result[active[rows]] = values
+
+                # Give up trials that can't meet anymore, at the latest after MAX_SLOTS
+                active = active[~hit & (limit[active] >= slot + k)]
+                slot += k
+                size *= 2
+
+            profiler.stop(start, 'slots', alg, simulated)
+            self.trace("%s: %d of %d trials failed", alg, active.size, num_iterations)
+            if self.trials is not None:
+                ok = result > 0
+                self.trials.extend(iterations, alg, np.where(ok, result, MAX_SLOTS), async_slots, ok)
+
+    # Samples the TTR of all trials of the random algorithm, see sampleRandomTTR()
+    def runAnalytic(self, alg, iterations, ttr, available, async_slots, neighbordetect):
+        start = self.profiler.start()
+        (meet, neighbor) = getRandomMeetingProbabilities(np.asarray(available))
+        result = np.zeros(len(iterations), dtype=int)
+        for (run, iteration) in enumerate(iterations):
+            result[run] = sampleRandomTTR(createRandomState(self.seed, iteration, alg), meet[run], neighbor[run],
+                                          neighbordetect[run]) or 0
+        ok = result > 0
+        tallyValues(ttr[alg], result[ok])
+        self.profiler.stop(start, 'analytic', alg)
+        if self.trials is not None:
+            self.trials.extend(iterations, alg, np.where(ok, result, MAX_SLOTS), async_slots, ok)
+
+
+# Evaluates deterministic algorithms exactly. Instead of drawing one
+# asynchronous start offset per trial, one period of each node's schedule is
+# built as integer array and the first meeting slot is computed for every
+# possible offset at once. The resulting TTR distribution of each channel map
+# is tallied with the probability of each value.
+class ExactEngine(Engine):
+    name = "ExactEngine"
+
+    def __init__(self, env, seed, acdp=0.0, has_random_replace=False, verbose=True, trials=None, events=None,
+                 profiler=None, analytic_random=False):
+        if trials is not None:
+            raise ValueError("Raw trial records are not supported in exact evaluation.")
+        if events is not None:
+            raise ValueError("Event traces are not supported in exact evaluation.")
+        if analytic_random:
+            raise ValueError("The analytic TTR of the random algorithm is not supported in exact evaluation.")
+        if env.num_nodes != 2:
+            raise ValueError("Exact evaluation is only supported for two nodes.")
+        Engine.__init__(self, env, seed, acdp, has_random_replace, verbose, profiler=profiler)
+
+    def run(self, algorithms, iterations, ttr, channel_maps=None, pair_ttr=None):
+        num_channels = self.env.max_num_channels
+        if channel_maps is None:
+            channel_maps = drawChannelMaps(self.env, self.seed, iterations)
+        profiler = self.profiler
+        for (i, run) in enumerate(iterations):
+            start = profiler.start()
+            self.env.initialize(createRandomState(self.seed, run), channel_maps[i])
+            nodes = self.env.getNodes()
+            profiler.stop(start, 'environment')
+
+            for alg in algorithms:
+                start = profiler.start()
+                self.env.initializeNodes(alg, self.has_random_replace, rng=createNodeRandomStates(self.seed, run, alg, len(nodes)))
+                profiler.stop(start, 'initialize_nodes', alg)
+
+                start = profiler.start()
+                schedules = [node.getAlgorithm().getSchedule() for node in nodes]
+                if any(schedule is None for schedule in schedules):
+                    raise ValueError("Rendezvous algorithm %s has no deterministic schedule, exact evaluation not supported." % (alg))
+
+                (values, probabilities) = self.getTTRDistribution(schedules, num_channels)
+                for (value, probability) in zip(values, probabilities):
+                    ttr[alg].tally(value, probability)
+                profiler.stop(start, 'exact', alg)
+                if values.size and self.verbose:
+                    self.trace("%s: mean TTR %.2f, MTTR %d, P(fail) %.2f", alg, np.average(values, weights=probabilities),
+                               values.max(), 1.0 - probabilities.sum())
+
+    # Returns the distinct TTR values and their probability, trials that
+    # never meet are not part of the distribution
+    def getTTRDistribution(self, schedules, num_channels):
+        # offsets are drawn uniformly like in the other engines, but only
+        # their residue modulo the period of the asynchronous node matters
+        offsets = np.arange(1, num_channels * num_channels)
+        period = len(schedules[ASYNC_NODE])
+        counts = np.bincount(offsets % period, minlength=period)
+        residues = np.flatnonzero(counts)
+        weights = counts[residues] / float(offsets.size)
+
+        # beacons on neighbor channels are detected with probability acdp
+        p_neighbor = min(max(self.acdp, 0.0), 1.0)
+        values = [self.getFirstMeetingSlots(schedules, residues, False)]
+        probabilities = [weights * (1.0 - p_neighbor)]
+        if p_neighbor > 0:
+            values.append(self.getFirstMeetingSlots(schedules, residues, True))
+            probabilities.append(weights * p_neighbor)
+        values = np.concatenate(values)
+        probabilities = np.concatenate(probabilities)
+
+        # merge equal values, drop failed trials
+        ok = values > 0
+        (values, inverse) = np.unique(values[ok], return_inverse=True)
+        probabilities = np.bincount(inverse, weights=probabilities[ok])
+        return (values, probabilities)
+
+    # Returns the TTR for each residue, or 0 if the nodes never meet
+    def getFirstMeetingSlots(self, schedules, residues, neighbordetect):
+        # after the lcm of all periods the joint schedule repeats
+        horizon = min(MAX_SLOTS, lcm([len(schedule) for schedule in schedules]))
+        result = np.zeros(residues.size, dtype=int)
+        pending = np.arange(residues.size)
+        start = 0
+        while pending.size and start < horizon:
+            # limit the size of the (residues, slots) arrays
+            block = max(16, 2**20 // pending.size)
+            pos = np.arange(start, min(start + block, horizon))
+            channels = []
+            for (n, schedule) in enumerate(schedules):
+                if n == ASYNC_NODE:
+                    channels.append(schedule[(residues[pending][:, None] + pos) % len(schedule)])
+                else:
+                    channels.append(schedule[(pos % len(schedule))[None, :]])
+
+            # all nodes on the same channel
+            met = np.ones(channels[0].shape, dtype=bool)
+            for c in channels[1:]:
+                met = met & (c == channels[0])
+            event = met
+            if neighbordetect:
+                # all nodes on two neighboring channels
+                highest = channels[0]
+                lowest = channels[0]
+                for c in channels[1:]:
+                    highest = np.maximum(highest, c)
+                    lowest = np.minimum(lowest, c)
+                neighbor = highest - lowest == 1
+                event = met | neighbor
+
+            hit = event.any(axis=1)
+            col = event[hit].argmax(axis=1)
+            slots = pos[col] + 1
+            if neighbordetect:
+                # see SlotEngine, two more slots for beaconing on the neighbors
+                slots += 3 * ~met[hit, col]
+            result[pending[hit]] = slots
+            pending = pending[~hit]
+            start += block
+        return result
@@ -14,7 +14,7 @@
 #
 # Copyright 2014 Andre Puschmann <andre.puschmann@tu-ilmenau.de>
 
-from algorithms import *
+from registry import createAlgorithm
 import numpy as np
 import sys
 
@@ -30,66 +30,113 @@ class Channel():
         return self.name
 
 
+# The channels of a node. Channels are stored as plain ids in the order they
+# were added, together with a map from id to index and a bitmap of all ids,
+# so that membership, lookup and overlap checks take constant time.
 class ChannelSet():
     def __init__(self, verbose=True):
         self.name = "ChannelSet"
-        self.channels = []
+        self.ids = []           # channel ids, indexed by position
+        self.positions = {}     # position of each channel id
+        self.bitmap = bytearray() # nonzero for each available channel id
+        self.channels = {}      # Channel objects, only if added as such
         self.max_num_channels = -1
         self.verbose = verbose
         
+    # Add a Channel object or plain channel id
     def add_channel(self, channel):
-        if len(self.channels) != self.max_num_channels:
-            self.channels.append(channel)
+        if isinstance(channel, Channel):
+            id = channel.getId()
+            self.channels[id] = channel
         else:
-            self.trace(0, "Failed to add channel with id %d, maximum number reached." % channel.getId())
+            id = int(channel)
+        if len(self.ids) != self.max_num_channels:
+            self.positions[id] = len(self.ids)
+            self.ids.append(id)
+            if id >= len(self.bitmap):
+                self.bitmap.extend(bytearray(id + 1 - len(self.bitmap)))
+            self.bitmap[id] = 1
+        else:
+            self.trace(0, "Failed to add channel with id %d, maximum number reached.", id)
 
     def setMaxNumChannels(self, num):
         self.max_num_channels = num
     
     def getNumChannels(self):
-        return len(self.channels)
+        return len(self.ids)
         
     def getMaxNumChannels(self):
         return self.max_num_channels
         
     def hasChannelWithId(self, id):
-        for chan in self.channels:
-            if chan.getId() == id:
-                return True
-        return False
+        return 0 <= id < len(self.bitmap) and self.bitmap[id] == 1
+
+    # Return a boolean array that tells for each of the ids if it is available
+    def hasChannelsWithIds(self, ids):
+        ids = np.asarray(ids)
+        inside = (ids >= 0) & (ids < len(self.bitmap))
+        result = np.zeros(ids.shape, dtype=bool)
+        result[inside] = np.frombuffer(bytes(self.bitmap), dtype=np.uint8)[ids[inside]] == 1
+        return result
         
+    # Accepts a Channel object or plain channel id
     def hasChannel(self, channel):
-        if channel in self.channels:
-            return True
+        if isinstance(channel, Channel):
+            channel = channel.getId()
+        return self.hasChannelWithId(channel)
+
+    # Return True if at least one channel is also part of the other set
+    def hasCommonChannel(self, other):
+        for id in self.ids:
+            if other.hasChannelWithId(id):
+                return True
         return False
     
     def getChannelsAsList(self):
-        return self.channels
+        return [self.getChannelById(id) for id in self.ids]
         
     def getChannelIdsAsList(self):
-        lst = []
-        for chan in self.channels:
-            lst.append(chan.getId())
-        return lst
+        return list(self.ids)
+
+    def getChannelIdsAsArray(self):
+        return np.array(self.ids, dtype=int)
+
+    # Return boolean availability mask of the first num channel ids
+    def getBitmap(self, num):
+        bitmap = np.zeros(num, dtype=bool)
+        size = min(num, len(self.bitmap))
+        bitmap[:size] = np.frombuffer(bytes(self.bitmap[:size]), dtype=np.uint8) > 0
+        return bitmap
         
     def getChannelById(self, id):
-        for chan in self.channels:
-            if chan.getId() is id:
-                return chan
+        if not self.hasChannelWithId(id):
+            return None
+        if id not in self.channels:
+            self.channels[id] = Channel(id)
+        return self.channels[id]
+
+    def getIndexOfChannelId(self, id):
+        return self.positions[id]
                 
     def sortById(self):
-        self.channels = sorted(self.channels, key=lambda chan: chan.getId())
+        self.ids.sort()
+        self.positions = dict((id, pos) for (pos, id) in enumerate(self.ids))
         
     def getChannelByIndex(self, pos):
-        return self.channels[pos]
+        return self.getChannelById(self.ids[pos])
+
+    def getChannelIdByIndex(self, pos):
+        return self.ids[pos]
         
     def printChannels(self):
-        self.trace(0, "My channels: %d" % self.getNumChannels())
-        for i in self.channels:
-            self.trace(message="  %s, id: %d" % (i.getName(), id(i)))        
-
-    def trace(self, slot=0, message=''):
-        if self.verbose: print "%d: %s:\t%s" % (slot, self.name, message)
+        if not self.verbose:
+            return
+        self.trace(0, "My channels: %d", self.getNumChannels())
+        for id in self.ids:
+            self.trace(0, "  Channel %d", id)
+
+    def trace(self, slot=0, message='', *args):
+        if self.verbose: print "%d: %s:\t%s" % (slot, self.name, message % args if args else message)
         
         
 
@@ -106,45 +153,13 @@ class Node():
     def configure(self, max_num_channels=-1):
         self.channelset.setMaxNumChannels(max_num_channels)
 
-    def initialize(self, algorithm=None, has_random_replace=False):
+    def initialize(self, algorithm=None, has_random_replace=False, rng=np.random):
         self.trace(0, "Try to initialize node")
         self.has_random_replace = has_random_replace
         
         algorithm = algorithm.strip()               
         if algorithm != None:
-            if algorithm == "random":
-                self.algorithm = RandomRendezvous(self.channelset, self.verbose)
-            elif algorithm == "seq":
-                self.algorithm = SequenceRendezvous(self.channelset, False)
-                #self.algorithm = SequenceRendezvous(num_channels_algorithm, True)
-                self.algorithm.printSequence()
-            elif algorithm == "mc":
-                self.algorithm = ModularClockRendezvous(self.channelset, self.verbose)
-            elif algorithm == "mmc":
-                self.algorithm = ModifiedModularClockRendezvous(self.channelset, self.verbose)                
-            elif algorithm == "js":
-                self.algorithm = JSHoppingRendezvous(self.channelset, self.verbose)
-            elif algorithm == "drseq":
-                self.algorithm = DRSeqRendezvous(self.channelset, self.verbose)
-            elif algorithm == "crseq":
-                self.algorithm = CRSeqRendezvous(self.channelset, self.verbose)
-            elif algorithm == "ex":
-                self.algorithm = LowestIdFirstExhaustiveSearch(self.id, self.channelset, self.verbose)
-            elif algorithm == "rex":
-                self.algorithm = RandomizedExhaustiveSearch(self.id, self.channelset, self.verbose)
-            elif algorithm == "lidfex":
-                self.algorithm = LowestIdFirstExhaustiveSearch(self.id, self.channelset, self.verbose)    
-            elif algorithm == "hidfex":
-                self.algorithm = HighestIdFirstExhaustiveSearch(self.id, self.channelset, self.verbose)    
-            elif algorithm == "lgfex":
-                self.algorithm = LargestGapFirstExhaustiveSearch(self.id, self.channelset, self.verbose)
-            elif algorithm == "sgfex":
-                self.algorithm = SmallestGapFirstExhaustiveSearch(self.id, self.channelset, self.verbose)
-            elif algorithm == "eofex":
-                self.algorithm = EvenOddFirstExhaustiveSearch(self.id, self.channelset, self.verbose)
-            else:
-                print "Rendezvous algorithm %s is not supported." % (algorithm)
-                sys.exit()   
+            self.algorithm = createAlgorithm(algorithm, self.id, self.channelset, self.verbose, rng)
         else:
             self.trace(0, "No channels or algorithm given, initialize later ..")
 
@@ -157,23 +172,37 @@ class Node():
         return self.channelset
 
 
+    def getAlgorithm(self):
+        return self.algorithm
+
+
     def getNextChannel(self, slot=0):
         self.trace(slot, "Determine next channel ...")
         r = self.algorithm.getNextChannel()
         # check validity
-        if self.channelset.hasChannel(r) == False:
-            print "Node %s doesn't have channel with id: %d" % (self.name, r.getId())
-            sys.exit()
-        self.trace(slot, "Next channel has id: %d" % r.getId())
+        if self.channelset.hasChannelWithId(r) == False:
+            raise RuntimeError("Node %s doesn't have channel with id: %d" % (self.name, r))
+        self.trace(slot, "Next channel has id: %d", r)
         return r
+
+    # Return the channel ids of the next k slots, starting with the given slot
+    def getNextChannels(self, k, slot=0):
+        self.trace(slot, "Determine next %d channels ...", k)
+        channels = self.algorithm.getNextChannels(k)
+        # check validity
+        valid = self.channelset.hasChannelsWithIds(channels)
+        if not valid.all():
+            raise RuntimeError("Node %s doesn't have channel with id: %d" % (self.name, channels[~valid][0]))
+        self.trace(slot, "Next channels have ids: %s", channels)
+        return channels
         
-    def trace(self, slot=0, message=''):
-        if self.verbose: print "%d: %s:\t%s" % (slot, self.name, message)
+    def trace(self, slot=0, message='', *args):
+        if self.verbose: print "%d: %s:\t%s" % (slot, self.name, message % args if args else message)
 
 
 
 class Environment():
-    def __init__(self, model, max_num_channels, num_overlap_channels, num_nodes, theta, block_width, verbose):
+    def __init__(self, model, max_num_channels, num_overlap_channels, num_nodes, theta, block_width, verbose, rng=np.random):
         self.name = "Environment"
         self.model = model
         self.max_num_channels = max_num_channels
@@ -182,31 +211,47 @@ class Environment():
         self.theta = theta
         self.block_width = block_width
         self.verbose = verbose
-        self.channel_maps = [] # store for all channel maps that have been created in this env
+        self.rng = rng # random generator used for channel selection and node initialization
+        self.corpus = None # recorded channel maps to replay instead of drawing new ones
 
 
-    def initialize(self):
-        # start environment creation
+    def initialize(self, rng=None, channel_map=None):
+        if rng is not None:
+            self.rng = rng
+        # start environment creation, draw a new channel map if none is given
+        if channel_map is None:
+            channel_map = self.generateChannelMaps(1)[0]
         self.nodes = self.createNodes(self.num_nodes, self.verbose)
-        channels = self.createChannels(self.max_num_channels)
 
-        if self.model == "symmetric":
-            self.selectCommonChannels(channels, self.nodes, self.max_num_channels, self.block_width)
-        elif self.model == "asymmetric":
-            self.selectCommonChannels(channels, self.nodes, self.num_overlap_channels, self.block_width)
-            self.selectIndividualChannels(channels, self.nodes, self.max_num_channels, self.num_overlap_channels, self.theta, self.block_width)
-
-        # sort channel indices by ID
-        for node in self.nodes:
-            node.channelset.sortById()
+        # channel ids are added in ascending order
+        for (node, available) in zip(self.nodes, channel_map):
+            for id in np.flatnonzero(available):
+                node.appendChannels(int(id))
             node.channelset.printChannels()
             
         # sanity check, there should be at least one overlapping channel
         self.checkForOverlappingChannel(self.nodes)
-        
-        # store channel map
-        self.channel_maps.append(self.getOverlappingChannelsAsBitArray())
-        #sys.exit()
+
+
+    # Draw the channel maps of many iterations at once, see generateChannelMaps()
+    def generateChannelMaps(self, num_maps, rng=None):
+        if rng is None:
+            rng = self.rng
+        return generateChannelMaps(rng, self.model, self.max_num_channels, self.num_overlap_channels,
+                                   self.num_nodes, self.theta, self.block_width, num_maps)
+
+
+    # Replay the channel maps of a ChannelMapCorpus, see corpus.py
+    def useChannelMapCorpus(self, corpus):
+        self.corpus = corpus
+
+
+    # Return the channel maps of the given iterations, either from the corpus
+    # or drawn from rng
+    def getChannelMaps(self, iterations, rng=None):
+        if self.corpus is not None:
+            return self.corpus.getMaps(iterations)
+        return self.generateChannelMaps(len(iterations), rng)
 
 
     def createNodes(self, num_nodes, verbose):
@@ -217,168 +262,48 @@ class Environment():
         return nodes
 
 
-    def initializeNodes(self, algorithm=None, has_random_replace=False):
-        for node in self.nodes:
+    # rng is either one generator shared by all nodes or a list with the
+    # generator of each node
+    def initializeNodes(self, algorithm=None, has_random_replace=False, nodes=None, rng=None):
+        if nodes is None:
+            nodes = self.nodes
+        if rng is None:
+            rng = self.rng
+        if not isinstance(rng, list):
+            rng = [rng] * len(nodes)
+        for (node, node_rng) in zip(nodes, rng):
             node.configure(self.max_num_channels)
-            node.initialize(algorithm, has_random_replace)
-
-
-    def createChannels(self, num):
-        # Create pool of available channels (numbered from zero to M-1)
-        pool = []
-        for i in range(num):
-            pool.append(Channel(i))
-        
-        self.trace(0, "Pool has %d channels" % len(pool))
-        return pool
-
-
-    def getChannelWithId(self, channels, id):
-        for chan in channels:
-            #print "id is: %d" % chan.getId()
-            if chan.getId() is id:
-                return chan
-
-
-    def removeChannelWithId(self, channels, id):
-        for chan in channels:
-            if chan.getId() == id:
-                channels.remove(chan)
-        
-
-    def selectCommonChannels(self, channels, nodes, num, width):
-        # Select G commonly available channels, try to satisfy block width
-        num_blocks = int(np.ceil(num / float(width)))
-        #print "num: %d" % num
-        #print "width: %d" % width
-        #print "num_blocks: %d" % num_blocks
-        
-        chan_ids = []
-        if width == 1:
-            # add all channels
-            for c in channels:
-                chan_ids.append(c.getId())
-        else:        
-            for i in range(num_blocks):
-                block = self.selectBlockOfChannels(channels, width)
-                #print block
-                for id in block:
-                    chan_ids.append(id)
-        
-        # make sure not to have too many channels
-        if len(chan_ids) > num:
-            # sort first, then trim 
-            chan_ids = sorted(chan_ids)
-            num_trim = len(chan_ids) - num
-            chan_ids = chan_ids[:-num_trim]
-
-        # add channels to each node
-        for id in chan_ids:
-            chan = self.getChannelWithId(channels, id)
-            if chan:
-                for node in nodes:
-                    node.appendChannels(chan)
-                self.removeChannelWithId(channels, id)
-
-
-    # Selects block of neighboring channels with specified width
-    def selectBlockOfChannels(self, channels, width):
-        chan_ids = []
-        c = np.random.choice(channels)
-        #print "c: %d" % c.getId()
-        chan_ids.append(c.getId())
-
-        # select upper and lower neighbor(s)
-        lower_counter = 1
-        upper_counter = 1
-        for i in range(1, width):
-            if i % 2 == 0:
-                # if even, we remove the lower neighbor
-                lower_neighbor = c.getId() - lower_counter
-                #print "remove lower_neighbor: %d" % lower_neighbor
-                chan_ids.append(lower_neighbor)
-                lower_counter +=1
-            else:
-                # if odd, we remove the upper neighbor
-                upper_neighbor = c.getId() + upper_counter
-                #print "remove upper_neighbor: %d" % upper_neighbor
-                chan_ids.append(upper_neighbor)
-                upper_counter += 1
-
-        # the upper selection process may select ids that are not sane, like -1, remove them
-        chan_ids = [x for x in chan_ids if x >= 0]
-        return chan_ids
-
-
-    def selectIndividualChannels(self, channels, nodes, num_channels, num_overlap_channels, theta, width):
-        # Distribute remaining channels over nodes
-        num_missing = int(np.ceil((num_channels * theta) - num_overlap_channels))
-        num_blocks = num_missing / width
-        
-        for node in nodes:
-            for n in range(num_blocks):
-                if channels:
-                    block = self.selectBlockOfChannels(channels, width)
-                    #print block
-                    for id in block:
-                        chan = self.getChannelWithId(channels, id)
-                        if chan:
-                            self.trace(0, "Channel %d is individual channel for node %d" % (chan.getId(), node.getId()))
-                            node.appendChannels(chan)
-                            channels.remove(chan)
-                else:
-                    print "Warning: M not large enough to satisfy N=M*theta!"
-                    pass
+            node.initialize(algorithm, has_random_replace, node_rng)
 
 
     def calculateChannelStatistics(self):
-        result = []
-        for node in self.nodes:
-            channels = node.channelset.getChannelsAsList()
-            chan_list = [chan.getId() for chan in channels]
-            binarymap = [0 for x in range(self.max_num_channels)] # initialize map to zero
-            # iterate over channel list and mark available channels
-            for c in chan_list:
-                binarymap[c] = 1
-            result.append(binarymap)
-
-        # Calculate intersection of all channel sets (works only for two users)
-        if len(result) == 2:
-            intersect = []
-            for (x,y) in zip(result[0],result[1]):
-                if ((x is 1) and (y is 1)):
-                    intersect.append(1)
-                elif (x is 1):
-                    intersect.append(0.66)
-                elif (y is 1):
-                    intersect.append(0.33)
-                else:
-                    intersect.append(0)
-            result.append(intersect)
+        bitmaps = np.array([node.channelset.getBitmap(self.max_num_channels) for node in self.nodes])
+        result = [list(bitmap.astype(int)) for bitmap in bitmaps]
 
+        # Calculate intersection of all channel sets. For two users, channels
+        # of only one node are marked with 0.66 or 0.33, for more users with
+        # the share of nodes that have them.
+        if len(result) == 2:
+            intersect = np.select([bitmaps[0] & bitmaps[1], bitmaps[0], bitmaps[1]], [1, 0.66, 0.33], 0)
         else:
-            print "Intersection only implemented for two users."
-            sys.exit()
+            intersect = bitmaps.mean(axis=0)
+        result.append(list(intersect))
 
         return result
 
 
     def checkForOverlappingChannel(self, nodes):
-        overlappingChannelFound = False
-        assert len(nodes) == 2
-        # Check if both nodes have at least one channel in common
-        channelSet = nodes[0].getChannelSet()
-        for i in range(channelSet.getNumChannels()):
-            if nodes[1].getChannelSet().hasChannel(channelSet.getChannelByIndex(i)) == True:
-                overlappingChannelFound = True
+        # Check if all nodes have at least one channel in common
+        common = nodes[0].getChannelSet().getBitmap(self.max_num_channels)
+        for node in nodes[1:]:
+            common &= node.getChannelSet().getBitmap(self.max_num_channels)
 
-        if not overlappingChannelFound:
-            print "No overlapping channel found, please check environment configuration"
-            sys.exit()
+        if not common.any():
+            raise RuntimeError("No overlapping channel found, please check environment configuration")
 
 
     def getOverlappingChannelsAsBitArray(self):
-        return self.calculateChannelStatistics()[2]
+        return self.calculateChannelStatistics()[-1]
 
 
     def getNodes(self):
@@ -388,13 +313,113 @@ class Environment():
     def getName(self):
         return self.name
 
-    def writeChannelMapsToFile(self, filename='channelmap.dat'):
-        # Write the array to disk
-        with file(filename, 'w') as outfile:
-            outfile.write('# In line in this file corresponds to the state of a channel, please see environment.py for details.\n')
-            for data_slice in self.channel_maps:
-                outfile.write('# Next iteration\n')
-                np.savetxt(outfile, data_slice, fmt='%-.2f')
-
-    def trace(self, slot=0, message=''):
-        if self.verbose: print "%d: %s:\t%s" % (slot, self.name, message)
+    def trace(self, slot=0, message='', *args):
+        if self.verbose: print "%d: %s:\t%s" % (slot, self.name, message % args if args else message)
+
+
+# Draws num_maps channel maps at once and returns the channel availability of
+# each node as boolean array of shape (num_maps, num_nodes, num_channels).
+# In the symmetric model, all nodes share all M channels. In the asymmetric
+# model, they share G common channels and each node gets individual channels
+# until it has M*theta channels. Channels are selected in blocks of
+# neighboring channels of the given width.
+def generateChannelMaps(rng, model, num_channels, num_overlap_channels, num_nodes, theta, width, num_maps=1):
+    maps = np.zeros((num_maps, num_nodes, num_channels), dtype=bool)
+    if model == "symmetric":
+        common = selectCommonChannels(rng, num_channels, num_channels, width, num_maps)
+        maps |= common[:, None, :]
+    elif model == "asymmetric":
+        common = selectCommonChannels(rng, num_channels, num_overlap_channels, width, num_maps)
+        maps |= common[:, None, :]
+        selectIndividualChannels(rng, maps, ~common, num_overlap_channels, theta, width)
+    return maps
+
+
+# Offsets of the channels of a block relative to its center: the center, its
+# upper neighbor, its lower neighbor, the second upper neighbor and so on
+def getBlockOffsets(width):
+    offsets = [0]
+    for i in range(1, width):
+        if i % 2 == 0:
+            offsets.append(-(i // 2))
+        else:
+            offsets.append((i + 1) // 2)
+    return np.array(offsets, dtype=int)
+
+
+def selectCommonChannels(rng, num_channels, num, width, num_maps):
+    # Select G commonly available channels, try to satisfy block width
+    common = np.zeros((num_maps, num_channels), dtype=bool)
+    if width == 1:
+        # all channels are candidates, trimming keeps the lowest ids
+        common[:, :num] = True
+        return common
+
+    # draw the block centers of all maps, centers may be drawn twice
+    num_blocks = int(np.ceil(num / float(width)))
+    centers = rng.randint(0, num_channels, size=(num_maps, num_blocks))
+    ids = (centers[:, :, None] + getBlockOffsets(width)).reshape(num_maps, -1)
+    rows = np.repeat(np.arange(num_maps), ids.shape[1]).reshape(ids.shape)
+
+    # count how often each id was selected, ids below zero are dropped,
+    # ids beyond M stay and are trimmed first as they are the highest
+    counts = np.zeros((num_maps, num_channels + width), dtype=int)
+    valid = ids >= 0
+    np.add.at(counts, (rows[valid], ids[valid]), 1)
+
+    # make sure not to have too many channels, i.e. keep an id if it is
+    # among the lowest num selected ids (including duplicates)
+    before = np.cumsum(counts, axis=1) - counts
+    common = (counts > 0) & (before < num)
+    return common[:, :num_channels]
+
+
+def selectIndividualChannels(rng, maps, pool, num_overlap_channels, theta, width):
+    # Distribute remaining channels over nodes
+    (num_maps, num_nodes, num_channels) = maps.shape
+    num_missing = int(np.ceil((num_channels * theta) - num_overlap_channels))
+    num_blocks = num_missing // width
+    if num_blocks <= 0:
+        return
+
+    # Visiting the channels in random order and taking the next one that is
+    # still in the pool is the same as drawing uniformly from the pool
+    keys = rng.random_sample((num_maps, num_channels))
+    keys[~pool] = np.inf
+    order = np.argsort(keys, axis=1)
+    pool_size = pool.sum(axis=1)
+    exhausted = False
+
+    if width == 1:
+        # blocks don't overlap, each node takes the next num_blocks channels
+        for n in range(num_nodes):
+            pos = np.arange(n * num_blocks, (n + 1) * num_blocks)
+            take = pos[None, :] < pool_size[:, None]
+            exhausted |= not take.all()
+            (r, k) = np.nonzero(take)
+            maps[r, n, order[r, pos[k]]] = True
+    else:
+        offsets = getBlockOffsets(width)
+        pos = np.zeros(num_maps, dtype=int)
+        for n in range(num_nodes):
+            for b in range(num_blocks):
+                # skip channels that were removed as part of another block
+                while True:
+                    active = np.flatnonzero(pos < num_channels)
+                    removed = ~pool[active, order[active, pos[active]]]
+                    if not removed.any():
+                        break
+                    pos[active[removed]] += 1
+
+                r = np.flatnonzero(pos < num_channels)
+                exhausted |= r.size < num_maps
+                ids = order[r, pos[r]][:, None] + offsets
+                valid = (ids >= 0) & (ids < num_channels)
+                ids = np.clip(ids, 0, num_channels - 1)
+                valid &= pool[r[:, None], ids]
+                block_rows = np.repeat(r, width).reshape(ids.shape)
+                maps[block_rows[valid], n, ids[valid]] = True
+                pool[block_rows[valid], ids[valid]] = False
+
+    if exhausted:
+        sys.stderr.write("Warning: M not large enough to satisfy N=M*theta!\n")
@@ -0,0 +1,112 @@
+#
+# This file is part of RendezvousSim. RendezvousSim is free software: you can
+# redistribute it and/or modify it under the terms of the GNU General Public
+# License as published by the Free Software Foundation, version 2.
+#
+# This program is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE.  See the GNU General Public License for more
+# details.
+#
+# You should have received a copy of the GNU General Public License along with
+# this program; if not, write to the Free Software Foundation, Inc., 51
+# Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+#
+# Copyright 2014 Andre Puschmann <andre.puschmann@tu-ilmenau.de>
+
+"""
+Binary trace of the channel selected by every node in every slot. This is a
+compact replacement for the verbose text output, which is meant for single
+trials only.
+
+ File layout:
+ magic           8 bytes, "RVSEVTS1"
+ header length   4 bytes, little endian
+ header          JSON object with the algorithms and the record fields, padded
+                 with spaces to a multiple of 64 bytes
+ events          records of EVENT_DTYPE, sorted by trial, algorithm, slot and
+                 node
+
+Slots are counted from the first slot after the asynchronous start, the slots
+of the asynchronous node before it are not traced.
+
+ Example:
+ trace = EventTrace('events.bin')
+ events = trace.select(trial=3, alg='js')
+"""
+
+import numpy as np
+from helper import writeBinaryHeader,readBinaryHeader
+
+MAGIC = "RVSEVTS1"
+
+EVENT_DTYPE = np.dtype([('trial', '<i8'), ('alg', '<i2'), ('slot', '<i4'), ('node', '<i4'), ('channel', '<i4')])
+
+
+# Collects the events of the trials simulated by one engine
+class EventLog():
+    def __init__(self, algorithms):
+        self.algorithms = list(algorithms)
+        self.events = []
+
+    # Add the channels of all nodes in some slots, channels has one row per
+    # slot and one column per node
+    def extend(self, trials, alg, slots, channels):
+        channels = np.asarray(channels)
+        (num_slots, num_nodes) = channels.shape
+        events = np.zeros(num_slots * num_nodes, dtype=EVENT_DTYPE)
+        events['trial'] = np.repeat(np.broadcast_to(trials, (num_slots,)), num_nodes)
+        events['alg'] = self.algorithms.index(alg)
+        events['slot'] = np.repeat(np.broadcast_to(slots, (num_slots,)), num_nodes)
+        events['node'] = np.tile(np.arange(num_nodes), num_slots)
+        events['channel'] = channels.ravel()
+        self.events.append(events)
+
+    def getEvents(self):
+        if not self.events:
+            return np.zeros(0, dtype=EVENT_DTYPE)
+        events = np.concatenate(self.events)
+        order = np.lexsort((events['node'], events['slot'], events['alg'], events['trial']))
+        return events[order]
+
+
+# Appends events to a new trace file
+class EventTraceWriter():
+    def __init__(self, filename, algorithms):
+        self.filename = filename
+        self.file = open(filename, 'wb')
+        writeBinaryHeader(self.file, MAGIC, {'algorithms': list(algorithms), 'fields': EVENT_DTYPE.names})
+
+    def append(self, events):
+        events.astype(EVENT_DTYPE).tofile(self.file)
+
+    def close(self):
+        self.file.close()
+
+
+# Read-only, memory-mapped access to the events of a trace file
+class EventTrace():
+    def __init__(self, filename):
+        self.filename = filename
+        (header, data_offset) = readBinaryHeader(filename, MAGIC, "an event trace")
+        self.algorithms = [str(alg) for alg in header['algorithms']]
+        self.events = np.memmap(filename, dtype=EVENT_DTYPE, mode='r', offset=data_offset)
+
+    def getAlgorithms(self):
+        return self.algorithms
+
+    def getEvents(self):
+        return self.events
+
+    def len(self):
+        return self.events.size
+
+    # Return the events matching all given values, e.g. of one trial and algorithm
+    def select(self, trial=None, alg=None, slot=None, node=None, channel=None):
+        mask = np.ones(self.events.size, dtype=bool)
+        if alg is not None:
+            mask &= self.events['alg'] == self.algorithms.index(alg)
+        for (name, value) in [('trial', trial), ('slot', slot), ('node', node), ('channel', channel)]:
+            if value is not None:
+                mask &= self.events[name] == value
+        return self.events[mask]
@@ -15,28 +15,110 @@
 # Copyright 2014 Andre Puschmann <andre.puschmann@tu-ilmenau.de>
 
 import numpy as np
+import zlib
+import json
+import struct
 
+HEADER_ALIGNMENT = 64
+
+# Tallies values, usually TTRs in slots, as histogram of counts. The memory
+# is bounded by the number of distinct values, not the number of tallies, and
+# all statistics including percentiles are exact. Monitors of different
+# workers can be merged without loss. The statistics of an empty monitor are NaN.
 class MinMaxMonitor():
     def __init__(self):
-        self.values = []
-    def tally(self, x):
-        self.values.append(x)
+        self.counts = {}
+    def tally(self, x, count=1):
+        self.counts[x] = self.counts.get(x, 0) + count
+    def histogram(self):
+        values = np.array(sorted(self.counts))
+        return (values, np.array([self.counts[x] for x in values]))
+    def mean(self):
+        if not self.counts:
+            return np.nan
+        (values, counts) = self.histogram()
+        return np.average(values, weights=counts)
+    def min(self):
+        if not self.counts:
+            return np.nan
+        return min(self.counts)
+    def max(self):
+        if not self.counts:
+            return np.nan
+        return max(self.counts)
+    def len(self):
+        return sum(self.counts.values())
+    def var(self):
+        if not self.counts:
+            return np.nan
+        (values, counts) = self.histogram()
+        return np.average((values - np.average(values, weights=counts))**2, weights=counts)
+    def std(self):
+        return np.sqrt(self.var())
+    # q-th percentile with linear interpolation, like np.percentile()
+    def percentile(self, q):
+        if not self.counts:
+            return np.nan
+        (values, counts) = self.histogram()
+        rank = q / 100.0 * (counts.sum() - 1)
+        cumulative = np.cumsum(counts)
+        lower = values[np.searchsorted(cumulative, np.floor(rank), side='right')]
+        upper = values[np.searchsorted(cumulative, np.ceil(rank), side='right')]
+        return lower + (upper - lower) * (rank - np.floor(rank))
+    def reset(self):
+        self.counts = {}
+    def get(self):
+        return self.histogram()
+    def merge(self, other):
+        for (x, count) in other.counts.items():
+            self.tally(x, count)
+
+
+# Like the MinMaxMonitor, but each value is tallied with a weight, e.g. its probability
+class DistributionMonitor():
+    def __init__(self):
+        self.weights = {}
+    def tally(self, x, weight=1.0):
+        self.weights[x] = self.weights.get(x, 0.0) + weight
+    def histogram(self):
+        values = np.array(sorted(self.weights))
+        return (values, np.array([self.weights[x] for x in values]))
     def mean(self):
-        return np.mean(self.values)
+        if not self.weights:
+            return np.nan
+        (values, weights) = self.histogram()
+        return np.average(values, weights=weights)
     def min(self):
-        return np.min(self.values)
+        if not self.weights:
+            return np.nan
+        return min(self.weights)
     def max(self):
-        return np.max(self.values)
+        if not self.weights:
+            return np.nan
+        return max(self.weights)
     def len(self):
-        return len(self.values)
+        return int(round(sum(self.weights.values())))
     def var(self):
-        return np.var(self.values)
+        if not self.weights:
+            return np.nan
+        (values, weights) = self.histogram()
+        return np.average((values - np.average(values, weights=weights))**2, weights=weights)
     def std(self):
-        return np.std(self.values)
+        return np.sqrt(self.var())
+    # Smallest value whose cumulative weight reaches q percent of the total
+    def percentile(self, q):
+        if not self.weights:
+            return np.nan
+        (values, weights) = self.histogram()
+        cumulative = np.cumsum(weights)
+        return values[min(np.searchsorted(cumulative, q / 100.0 * cumulative[-1]), values.size - 1)]
     def reset(self):
-        self.values = []
+        self.weights = {}
     def get(self):
-        return self.values
+        return self.histogram()
+    def merge(self, other):
+        for (x, weight) in other.weights.items():
+            self.tally(x, weight)
 
 
 def isEqual(iterator):
@@ -48,18 +130,66 @@ def isEqual(iterator):
          return True
 
 
+# Return True if the nodes are spread over two neighboring channels, e.g. two
+# nodes on direct neighbors
 def areNeighborChannels(channels):
-    assert len(channels) == 2
-   
-    # check upper neighbor
-    if channels[0].getId() == (channels[1].getId() + 1):
-        return True
-    # .. and lower neighbor
-    elif channels[0].getId() == (channels[1].getId() - 1):
-        return True
-    
-    return False
+    return np.max(channels) - np.min(channels) == 1
+
+
+# Return True if at least two nodes have selected the same channel
+def hasCommonChannel(channels):
+    return np.unique(channels).size < len(channels)
+
+
+def lcm(numbers):
+    result = 1
+    for n in numbers:
+        a, b = result, n
+        while b:
+            a, b = b, a % b
+        result = result * n // a
+    return result
+
+
+# Create a random generator with a stream derived from the seed and the
+# given keys, e.g. the iteration and the algorithm name
+def createRandomState(seed, *keys):
+    key = [seed]
+    for k in keys:
+        if isinstance(k, str):
+            k = zlib.crc32(k.strip()) & 0xffffffff
+        key.append(k)
+    return np.random.RandomState(key)
+
+
+# Write the header of a binary file: the magic string, the length of the JSON
+# header as 4 bytes little endian and the header, padded with spaces so the
+# data starts at a multiple of HEADER_ALIGNMENT bytes
+def writeBinaryHeader(f, magic, header):
+    header = json.dumps(header, sort_keys=True)
+    data_offset = len(magic) + 4 + len(header)
+    header += " " * (-data_offset % HEADER_ALIGNMENT)
+    f.write(magic)
+    f.write(struct.pack("<I", len(header)))
+    f.write(header)
+
+
+# Return the JSON header of a binary file written by writeBinaryHeader() and
+# the offset of its data, kind names the file type in the error message
+def readBinaryHeader(filename, magic, kind):
+    with open(filename, 'rb') as f:
+        if f.read(len(magic)) != magic:
+            raise ValueError("%s is not %s." % (filename, kind))
+        (header_len,) = struct.unpack("<I", f.read(4))
+        header = json.loads(f.read(header_len))
+    return (header, len(magic) + 4 + header_len)
 
 
 def string_splitter(option, opt, value, parser):
     setattr(parser.values, option.dest, value.split(','))
+
+
+# Add the --target-ci option, shared by rendezvoussim2.py and sweep.py
+def addTargetCiOption(parser):
+    parser.add_option("--target-ci", dest="target_ci", type="float", default=None,
+                      help="Stop each algorithm once the 95% confidence interval of its mean TTR is narrower than this share of the mean, -i is the maximum number of iterations")
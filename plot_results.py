@@ -20,32 +20,33 @@
 Created on Wed Nov 27 13:07:11 2013
 
  File layout:
- alg  M  G  num_it  num_ok  num_nok  TTRmin  TTRmean  TTRmax  TTRstd  bw  acdp  theta
+ alg  M  G  num_it  num_ok  num_nok  TTRmin  TTRmean  TTRmax  TTRstd  bw  acdp  theta  TTRp50  TTRp95  TTRp99
  ...
- 
- Resulting dtype: 
- dtype=[('alg','|S10'),
-                  ('max_num_channels','i8'),
-                  ('num_overlapping_channels','i8'),
-                  ('num_it','i8'),
-                  ('num_it_ok','i8'),
-                  ('num_it_nok','i8'),
-                  ('ttr_min','f8'),
-                  ('ttr_mean','f8'),
-                  ('ttr_max','f8'),
-                  ('ttr_std','f8'),
-                  ('bw','i8'),
-                  ('acdp','f8'),
-                  ('theta','f8')]],
+
+ Files without percentiles can still be plotted. Instead of a file, the input
+ can be a result store directory (see resultstore.py) that collects the rows of
+ many sweeps. Rows are grouped by algorithm and x value, and x values are
+ plotted in ascending order. The other parameters must be the same in all
+ rows, rows of other sweeps are left out with --where, e.g.
+ --where max_num_channels=80 --where theta=0.5.
+
+ Batch mode (--batch SPEC) renders many plots of one input without display.
+ The input is read once, each plot is drawn on its own Agg figure and saved,
+ and -j spreads the plots over worker processes. SPEC is a JSON file:
+ {"input": "results",
+  "plots": [{"x": "num_overlapping_channels", "y": "ttr", "output": "ttr_m80.pdf",
+             "filter": {"max_num_channels": 80, "theta": 0.5},
+             "algorithms": ["random", "js"], "tex": false}, ...]}
+ filter, algorithms and tex are optional.
 
 """
 
-import numpy as np
-import pylab as pl
-from plotter import Plotter
 import sys
+import json
+import numpy as np
 from optparse import OptionParser
 from helper import string_splitter
+from resultstore import readResults
 
 labels = {"random":"Random",
           "js":"Jump-Stay",
@@ -55,6 +56,18 @@ labels = {"random":"Random",
           "lidfex":"LIDF-EX",
           "rex":"RP-EX"}
 
+# Parameters that are fixed in a plot of each x axis, G follows M in symmetric sweeps
+STATIC_PARAMETERS = {'max_num_channels': ['bw', 'theta', 'acdp'],
+                     'num_overlapping_channels': ['max_num_channels', 'bw', 'theta', 'acdp'],
+                     'bw': ['max_num_channels', 'num_overlapping_channels', 'theta', 'acdp']}
+
+VALID_X_VALUES = ['max_num_channels', 'num_overlapping_channels', 'bw']
+FILTER_COLUMNS = ['max_num_channels', 'num_overlapping_channels', 'bw', 'theta', 'acdp']
+VALID_Y_VALUES = {'ttr': 'ttr_mean', 'mttr': 'ttr_max'}
+
+# Table of the batch mode, loaded before the workers are forked
+batch_data = None
+
 def get_label(alg):
     try:
         return labels[alg]
@@ -62,6 +75,139 @@ def get_label(alg):
         return alg
 
 
+def check_axes(x_axis_param, y_axis_param):
+    if x_axis_param not in VALID_X_VALUES:
+        raise ValueError("%s is not a valid option as x value." % x_axis_param)
+    if y_axis_param not in VALID_Y_VALUES:
+        raise ValueError("%s is not a valid option as y value." % y_axis_param)
+
+
+# Return the filter of --where conditions of the form column=value
+def parse_where(conditions):
+    filters = {}
+    for condition in conditions or []:
+        (name, sep, value) = condition.partition('=')
+        if not sep or name not in FILTER_COLUMNS:
+            raise ValueError("%s is not a valid condition, use COLUMN=VALUE with COLUMN one of %s." % (condition, ", ".join(FILTER_COLUMNS)))
+        filters[name] = float(value)
+    return filters
+
+
+# Return the algorithms, the x values, the y values of each algorithm and the
+# static parameters of a plot of the rows matching the filter
+def get_plot_data(data, x_axis_param, y_axis_param, algs=None, filters=None):
+    data = data.select(alg=algs, **(filters or {}))
+    if not data.len():
+        raise ValueError("No results to plot.")
+
+    # All rows must share the static variables, num_overlapping_channels can
+    # be used for both symmetric and assymetric results
+    params = STATIC_PARAMETERS[x_axis_param]
+    (groups, inverse) = data.groupBy(params)
+    if groups[params[0]].size > 1:
+        sweeps = [" ".join("%s=%g" % (param, groups[param][k]) for param in params)
+                  for k in range(groups[params[0]].size)]
+        raise ValueError("The results hold more than one sweep, select one with --where: %s" % "; ".join(sweeps))
+    static = dict((param, data.getColumn(param)[0])
+                  for param in ['max_num_channels', 'num_overlapping_channels', 'num_it', 'bw', 'theta'])
+
+    # Extract samples for each algorithm and x value
+    (algs_to_plot, x_values, series) = data.getSeries(x_axis_param, VALID_Y_VALUES[y_axis_param])
+    return (algs_to_plot, x_values, dict(zip(algs_to_plot, series)), static)
+
+
+def print_table(x_axis_param, plot_data):
+    (algs_to_plot, x_values, y_values, static) = plot_data
+    print "#%s\t" % x_axis_param,
+    for alg in algs_to_plot:
+        print "%s\t" % get_label(alg),
+    print ""
+
+    for i in range(len(x_values)):
+        print "%2.0f\t" % x_values[i],
+        for alg in algs_to_plot:
+            print "%2.2f\t" % y_values[alg][i],
+        print ""
+
+
+# Return a Plotter with the plot drawn on the given figure, or on a new pyplot figure
+def create_plot(x_axis_param, y_axis_param, plot_data, figure=None):
+    from plotter import Plotter
+    (algs_to_plot, x_values, y_values, static) = plot_data
+    min_x_value = x_values[0]
+    max_x_value = x_values[-1]
+
+    plot = Plotter(figure=figure)
+    plot.set_size(120,80) # set image size in mm
+    plot.add_xaxis(x_values)
+    plot.set_axis_lim([min_x_value, max_x_value])
+    if max_x_value <= 20:
+        plot.set_xticks(min_x_value, max_x_value + 1, 1)
+    else:
+        plot.set_xticks(min_x_value, max_x_value + 1, 10)
+
+    M = static['max_num_channels']
+    G = static['num_overlapping_channels']
+    theta = static['theta']
+    if x_axis_param == 'max_num_channels':
+        plot.set_axis_labels('Total number of channels')
+        plot.set_legend_pos('upper left')
+    elif x_axis_param == 'num_overlapping_channels':
+        plot.set_axis_labels('Number of overlapping channels')
+        plot.set_legend_pos('upper right')
+        plot.set_title('M=%d, ' r'$\theta$' '=%.2f' % (M, theta))
+    elif x_axis_param == 'bw':
+        plot.set_axis_labels('Average channel block width')
+        plot.set_legend_pos('upper left')
+        plot.set_title('M=%d, G=%d, ' r'$\theta$' '=%.2f' % (M, G, theta))
+
+    # Plot mean or max value for each algorithm
+    for alg in algs_to_plot:
+        plot.add_data(y_values[alg], label=get_label(alg))
+    if y_axis_param == 'ttr':
+        plot.set_axis_labels(None, 'Mean TTR [slots]')
+        #plot.set_axis_lim([1,20], [0,2500])
+    elif y_axis_param == 'mttr':
+        plot.set_axis_labels(None, 'Maximum TTR [slots]')
+    return plot
+
+
+# Render one entry of a plot spec to its own headless figure, the rc params
+# changed by TeX output are restored afterwards
+def render_plot(entry):
+    import matplotlib
+    from plotter import create_headless_figure
+    plot_data = get_plot_data(batch_data, entry['x'], entry['y'], entry.get('algorithms'), entry.get('filter'))
+    with matplotlib.rc_context():
+        plot = create_plot(entry['x'], entry['y'], plot_data, create_headless_figure())
+        if entry.get('tex'):
+            plot.set_use_tex()
+        plot.save_plots(entry['output'])
+    return entry['output']
+
+
+# Render all plots of a spec, the input is read once and shared with the workers
+def run_batch(spec, infile=None, jobs=1):
+    global batch_data
+    import matplotlib
+    matplotlib.use('Agg')
+    for entry in spec['plots']:
+        check_axes(entry['x'], entry['y'])
+    batch_data = readResults(infile or spec['input'])
+    if jobs > 1:
+        import multiprocessing
+        pool = multiprocessing.Pool(jobs)
+        try:
+            for output in pool.imap(render_plot, spec['plots']):
+                print output
+        finally:
+            pool.close()
+            pool.join()
+    else:
+        for entry in spec['plots']:
+            print render_plot(entry)
+
+
 def main():
     usage = "usage: %prog [options] arg"
     parser = OptionParser(usage)
@@ -74,7 +220,7 @@ def main():
     parser.add_option("--tex", dest="usetex", default=False, action="store_true",
                       help="Whether to TeX for output")
     parser.add_option("-i", "--input", dest="infile",
-                      help="Read from file", metavar="FILE")
+                      help="Read from a result file or a result store directory", metavar="FILE")
     parser.add_option("-o", "--output", dest="outfile",
                       help="Write output to file", metavar="FILE")
     parser.add_option("-c", "--console", help="Plot results to console",
@@ -82,6 +228,12 @@ def main():
     parser.add_option("-a", "--algorithm", dest="algorithm",
                       help="Which rendezvous algorithm to include in plot",
                       type='string', action='callback', callback=string_splitter)
+    parser.add_option("-w", "--where", dest="where", metavar="COLUMN=VALUE", action="append",
+                      help="Only plot rows with this value, can be given more than once (columns are: %s)" % ", ".join(FILTER_COLUMNS))
+    parser.add_option("-b", "--batch", dest="batch", metavar="SPEC",
+                      help="Render all plots of the JSON plot spec SPEC to files without display, -i overrides its input")
+    parser.add_option("-j", "--jobs", dest="jobs", type="int", default=1,
+                      help="How many worker processes render the plots of a batch")
 
 
     # turn command line parameters into local variables
@@ -95,141 +247,34 @@ def main():
     console = options.console
     algs_asked_to_plot = options.algorithm
 
+    if options.batch:
+        with open(options.batch) as f:
+            spec = json.load(f)
+        try:
+            run_batch(spec, infile, options.jobs)
+        except ValueError as e:
+            print e
+            sys.exit()
+        return
+
     # Stop if x,y and input are not given
-    #print x_axis_param
-    
     if (not x_axis_param) or (not y_axis_param) or (not infile):
         parser.error("Incorrect number of arguments")
 
-    # Read values
-    data = np.genfromtxt(infile, comments="#", delimiter='\t',
-                          dtype=[('alg','|S10'),
-                      ('max_num_channels','i8'),
-                      ('num_overlapping_channels','i8'),
-                      ('num_it','i8'),
-                      ('num_it_ok','i8'),
-                      ('num_it_nok','i8'),
-                      ('ttr_min','f8'),
-                      ('ttr_mean','f8'),
-                      ('ttr_max','f8'),
-                      ('ttr_std','f8'),
-                      ('bw','i8'),
-                      ('acdp','f8'),
-                      ('theta','f8')]
-                         )
-    
-    valid_x_values = ['max_num_channels', 'num_overlapping_channels', 'bw']
-    valid_y_values = ['ttr', 'mttr']
-    
-    # check if x and y are valid options
-    if x_axis_param not in valid_x_values:
-        print "%s is not a valid option as x value." % x
-        sys.exit()
-        
-    if y_axis_param not in valid_y_values:
-        print "%s is not a valid option as y value." % x
+    # Read values from a result file or store
+    try:
+        check_axes(x_axis_param, y_axis_param)
+        plot_data = get_plot_data(readResults(infile), x_axis_param, y_axis_param, algs_asked_to_plot,
+                                  parse_where(options.where))
+    except ValueError as e:
+        print e
         sys.exit()
-   
-    # Extract values for x axis, num_overlapping_channels can be
-    # used for both symmetric and assymetric results
-    raw_x = data[x_axis_param]
-    
-    # .. remove duplets
-    x_values = []
-    for val in raw_x:
-        if val not in x_values:
-            x_values.append(val)
-    min_x_value = x_values[0]
-    max_x_value = x_values[-1]
-    
-    #print raw_x
-
-    #print len(x_values)
-    #print x_values
-
-    # Extract algorithms in result file
-    algs_to_plot = []
-    for x in data['alg']:
-        if x not in algs_to_plot:
-            if (algs_asked_to_plot == None) or (x in algs_asked_to_plot):
-                algs_to_plot.append(x)
-            
-    # Extract samples for each algorithm
-    mean_values = {}
-    max_values = {}
-    for alg in algs_to_plot:
-        raw_samples = [x for x in data if x['alg'] == alg]
-        mean_values[alg] = [x[7] for x in raw_samples] # mean values are in column 8
-        #print len(mean_values[alg])
-        max_values[alg] = [x[8] for x in raw_samples] # max values are in column 9
-    
-    # Extract static variables, take first value in each row
-    M = data['max_num_channels'][0]
-    G = data['num_overlapping_channels'][0]
-    it = data['num_it'][0]
-    bw = data['bw'][0]
-    theta = data['theta'][0]
 
     if console:
         # Print raw data to console
-        print "#%s\t" % x_axis_param,
-        for alg in algs_to_plot:
-            print "%s\t" % get_label(alg),
-        print ""
-            
-        # print results
-        for i in range(len(x_values)):
-            print "%2.0f\t" % x_values[i],
-            for alg in algs_to_plot:                
-                if y_axis_param == 'ttr':
-                    print "%2.2f\t" % mean_values[alg][i],
-                elif y_axis_param == 'mttr':
-                    print "%2.2f\t" % max_values[alg][i],
-                    
-            print ""           
+        print_table(x_axis_param, plot_data)
     else:
-        plot = Plotter()
-        plot.set_size(120,80) # set image size in mm
-        plot.add_xaxis(x_values)
-        plot.set_axis_lim([min_x_value, max_x_value])
-        if max_x_value <= 20:
-            plot.set_xticks(min_x_value, max_x_value + 1, 1)
-        else:
-            plot.set_xticks(min_x_value, max_x_value + 1, 10)
-
-        if x_axis_param == 'max_num_channels':
-            plot.set_axis_labels('Total number of channels')
-            plot.set_legend_pos('upper left')
-        elif x_axis_param == 'num_overlapping_channels':
-            plot.set_axis_labels('Number of overlapping channels')
-            plot.set_legend_pos('upper right')
-            plot.set_title('M=%d, ' r'$\theta$' '=%.2f' % (M, theta))
-        elif x_axis_param == 'bw':
-            plot.set_axis_labels('Average channel block width')
-            plot.set_legend_pos('upper left')
-            plot.set_title('M=%d, G=%d, ' r'$\theta$' '=%.2f' % (M, G, theta))
-        
-        print len(mean_values)
-        print len(x_values)
-        #sys.exit(0)
-        
-        if y_axis_param == 'ttr':
-            # Plot mean value for each algorithm
-            for alg in algs_to_plot:
-                print alg
-                print len(mean_values[alg])
-                print mean_values[alg]
-                print len(x_values)
-        
-                
-                plot.add_data(mean_values[alg], label=get_label(alg))
-            plot.set_axis_labels(None, 'Mean TTR [slots]')
-            #plot.set_axis_lim([1,20], [0,2500])
-        elif y_axis_param == 'mttr':
-            # Plot max value for each algorithm
-            for alg in algs_to_plot:
-                plot.add_data(max_values[alg], label=get_label(alg))
-            plot.set_axis_labels(None, 'Maximum TTR [slots]')
+        plot = create_plot(x_axis_param, y_axis_param, plot_data)
 
         if usetex:
             plot.set_use_tex()
@@ -15,8 +15,7 @@
 # Copyright 2014 Andre Puschmann <andre.puschmann@tu-ilmenau.de>
 
 import numpy as np
-import matplotlib.pyplot as plt
-from pylab import *
+import matplotlib
 from itertools import cycle
 
 # some colors and line markers
@@ -25,8 +24,19 @@ line_markers = ["-", "--", "-.", ":", "."]
 
 
 
+# Return a figure with its own Agg canvas, which is drawn without pyplot, so
+# no state is shared between figures and no display is needed
+def create_headless_figure():
+    from matplotlib.figure import Figure
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+    figure = Figure()
+    FigureCanvasAgg(figure)
+    return figure
+
+
+# Draws on the given figure, or on a new pyplot figure that can be shown
 class Plotter(object):
-    def __init__(self, filename="dummy.dat"):
+    def __init__(self, filename="dummy.dat", figure=None):
         self.colors = ['blue', 'red', 'green']
         self.colorcycler = cycle(self.colors)
         self.linecolor = next(self.colorcycler)
@@ -40,7 +50,11 @@ class Plotter(object):
         self.xlim = 0
         self.ylim = 0
         self.legendpos = 'upper right'
-        self.fig = plt.figure(1)
+        self.decorated = False
+        if figure is None:
+            import matplotlib.pyplot as plt
+            figure = plt.figure()
+        self.fig = figure
         self.ax = self.fig.add_subplot(111)
         self.ax.patch.set_alpha(0.3)
         self.ax.patch.set_facecolor('white')
@@ -68,19 +82,18 @@ class Plotter(object):
         self.xtick_start = start
         self.xtick_stop = stop
         self.xtick_stepsize = stepsize
-        plt.xticks(np.arange(self.xtick_start, self.xtick_stop, self.xtick_stepsize))
+        self.ax.set_xticks(np.arange(self.xtick_start, self.xtick_stop, self.xtick_stepsize))
             
     def set_legend_pos(self, pos):
         self.legendpos = pos
 
     def add_data(self, data, label='None', linestyle=None, color='blue'):       
         (linestyle, linecolor) = self.get_line_style_and_color()
-        plt.plot(self.x, data, linestyle, linewidth=2.0, label=label, color=linecolor)
-        #plt.errorbar(self.x, data, xerr=0.2, yerr=0.4)
-        plt.grid=True
+        self.ax.plot(self.x, data, linestyle, linewidth=2.0, label=label, color=linecolor)
+        #self.ax.errorbar(self.x, data, xerr=0.2, yerr=0.4)
 
     def add_vertical_line(self, pos, color='black', style='dashed'):
-        plt.axvline(x=pos, color=color, ls=style)
+        self.ax.axvline(x=pos, color=color, ls=style)
         
     def get_line_style_and_color(self):
         # iterate over colors first, then use different linestyles, too
@@ -91,13 +104,16 @@ class Plotter(object):
         return (self.linestyle, self.linecolor)
 
     def decorate_plots(self):
-        legend = plt.legend(loc=self.legendpos, shadow=False)
+        if self.decorated:
+            return
+        self.decorated = True
+        legend = self.ax.legend(loc=self.legendpos, shadow=False)
         frame = legend.get_frame()
         frame.set_facecolor('0.90')
-        plt.xlabel(self.xlabel)
-        plt.ylabel(self.ylabel)
-        plt.xlim(self.xlim)
-        plt.ylim(self.ylim)
+        self.ax.set_xlabel(self.xlabel)
+        self.ax.set_ylabel(self.ylabel)
+        self.ax.set_xlim(self.xlim)
+        self.ax.set_ylim(self.ylim)
         self.ax.set_title(self.title)
         
     def set_use_tex(self):
@@ -111,15 +127,17 @@ class Plotter(object):
                   'xtick.labelsize': 9,
                   'ytick.labelsize': 9,
                   'text.usetex': True}
-        plt.rcParams.update(params)
+        matplotlib.rcParams.update(params)
 
     def set_size(self, width, height):
         self.fig.set_size_inches(width / 2.54 / 10, height / 2.54 / 10)
 
     def show_plots(self):
+        import matplotlib.pyplot as plt
         self.decorate_plots()
         plt.show()
 
     def save_plots(self, filename):
-        plt.savefig(filename)
+        self.decorate_plots()
+        self.fig.savefig(filename)
 
@@ -0,0 +1,116 @@
+#
+# This file is part of RendezvousSim. RendezvousSim is free software: you can
+# redistribute it and/or modify it under the terms of the GNU General Public
+# License as published by the Free Software Foundation, version 2.
+#
+# This program is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE.  See the GNU General Public License for more
+# details.
+#
+# You should have received a copy of the GNU General Public License along with
+# this program; if not, write to the Free Software Foundation, Inc., 51
+# Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+#
+# Copyright 2014 Andre Puschmann <andre.puschmann@tu-ilmenau.de>
+
+"""
+Time and memory profile of the phases of a simulation. Each phase is
+measured per algorithm, phases that are shared by all algorithms, like the
+creation of the environment, are listed without algorithm.
+
+ Phases:
+ environment        drawing channel maps and creating the nodes
+ initialize_nodes   creating the rendezvous algorithm of every node
+ async_start        stepping the asynchronous node before the trial starts
+ slots              the slot loop, slots counts the simulated slots of all trials
+ analytic           sampling the TTR of the random algorithm instead of the slot loop
+ exact              the exact evaluation of all start offsets
+ merge              merging the statistics of all chunks
+ output             formatting and printing the results
+
+The peak resident set size of a process only grows. The memory of a phase is
+how much one call of the phase raised it at most, in kB, so phases that
+allocate more than any phase before them stand out. Phases whose memory fits
+into the peak reached before report 0.
+"""
+
+import sys
+import json
+import time
+import resource
+from cache import getCodeVersion
+
+PHASES = ['environment', 'initialize_nodes', 'async_start', 'slots', 'analytic', 'exact', 'merge', 'output']
+
+
+def getPeakMemory():
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+class Profiler():
+    def __init__(self):
+        self.phases = {} # (phase, alg) -> [wall time, calls, slots, peak memory growth]
+
+    # Return the start time and peak memory of a phase, pass it to stop() at its end
+    def start(self):
+        return (time.time(), getPeakMemory())
+
+    def stop(self, start, phase, alg=None, slots=0):
+        (start_time, start_memory) = start
+        entry = self.phases.setdefault((phase, alg), [0.0, 0, 0, 0])
+        entry[0] += time.time() - start_time
+        entry[1] += 1
+        entry[2] += slots
+        entry[3] = max(entry[3], getPeakMemory() - start_memory)
+
+    def merge(self, other):
+        for (key, (wall, calls, slots, memory)) in other.phases.items():
+            entry = self.phases.setdefault(key, [0.0, 0, 0, 0])
+            entry[0] += wall
+            entry[1] += calls
+            entry[2] += slots
+            entry[3] = max(entry[3], memory)
+
+    # Return one dict per phase and algorithm, in the order of PHASES
+    def getReport(self):
+        report = []
+        for (phase, alg) in sorted(self.phases, key=lambda key: (PHASES.index(key[0]), key[1])):
+            (wall, calls, slots, memory) = self.phases[(phase, alg)]
+            report.append({'phase': phase,
+                           'algorithm': alg,
+                           'wall_time': wall,
+                           'calls': calls,
+                           'slots': slots,
+                           'slots_per_second': slots / wall if slots and wall > 0 else None,
+                           'peak_memory_growth_kb': memory})
+        return report
+
+    def formatReport(self):
+        lines = ["%-18s%-8s\twall[s]\tcalls\tslots\tslots/s\tpeak+[kB]" % ("#phase", "alg")]
+        for entry in self.getReport():
+            rate = "%.0f" % entry['slots_per_second'] if entry['slots_per_second'] else "-"
+            lines.append("%-18s%-8s\t%.3f\t%d\t%d\t%s\t%d" % (entry['phase'], entry['algorithm'] or "-", entry['wall_time'],
+                                                               entry['calls'], entry['slots'], rate, entry['peak_memory_growth_kb']))
+        return lines
+
+
+# Stands in for the Profiler if profiling is off and does nothing
+class NullProfiler():
+    def start(self):
+        return 0
+
+    def stop(self, start, phase, alg=None, slots=0):
+        pass
+
+
+# Print the human-readable report of each profile to stderr and write all of
+# them as JSON to filename, together with the parameters of their simulation
+def writeProfiles(filename, points):
+    records = []
+    for (parameters, profiler) in points:
+        for line in profiler.formatReport():
+            print >>sys.stderr, line
+        records.append({'parameters': parameters, 'phases': profiler.getReport()})
+    with open(filename, 'w') as f:
+        json.dump({'code_version': getCodeVersion(), 'points': records}, f, indent=1, sort_keys=True)
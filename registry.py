@@ -0,0 +1,79 @@
+#
+# This file is part of RendezvousSim. RendezvousSim is free software: you can
+# redistribute it and/or modify it under the terms of the GNU General Public
+# License as published by the Free Software Foundation, version 2.
+#
+# This program is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE.  See the GNU General Public License for more
+# details.
+#
+# You should have received a copy of the GNU General Public License along with
+# this program; if not, write to the Free Software Foundation, Inc., 51
+# Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+#
+# Copyright 2014 Andre Puschmann <andre.puschmann@tu-ilmenau.de>
+
+"""
+Registry of the rendezvous algorithms by name. Each entry names the module and
+the class (or factory function) of an algorithm, the module is imported when a
+node first uses the algorithm, so tools that don't simulate never import it.
+
+The constructor takes (channelset, verbose, rng), or (id, channelset, verbose,
+rng) if the algorithm needs the id of its node.
+
+ Example:
+ register('myex', 'myalgorithms', 'MyExhaustiveSearch', with_id=True)
+ algorithm = createAlgorithm('myex', node.getId(), node.getChannelSet(), False, rng)
+"""
+
+import importlib
+from collections import OrderedDict
+
+algorithms = OrderedDict() # name -> (module, class, whether the constructor takes the node id)
+classes = {}
+
+
+def register(name, module, classname, with_id=False):
+    algorithms[name] = (module, classname, with_id)
+    classes.pop(name, None)
+
+
+def getAlgorithmNames():
+    return list(algorithms)
+
+
+def isRegistered(name):
+    return name in algorithms
+
+
+# Return the class of an algorithm, its module is imported on first use
+def getAlgorithmClass(name):
+    if name not in classes:
+        if name not in algorithms:
+            raise ValueError("Rendezvous algorithm %s is not supported." % (name))
+        (module, classname, with_id) = algorithms[name]
+        classes[name] = getattr(importlib.import_module(module), classname)
+    return classes[name]
+
+
+def createAlgorithm(name, node_id, channelset, verbose, rng):
+    cls = getAlgorithmClass(name)
+    if algorithms[name][2]:
+        return cls(node_id, channelset, verbose, rng)
+    return cls(channelset, verbose, rng)
+
+
+register('random', 'algorithms', 'RandomRendezvous')
+register('mc', 'algorithms', 'ModularClockRendezvous')
+register('mmc', 'algorithms', 'ModifiedModularClockRendezvous')
+register('js', 'algorithms', 'JSHoppingRendezvous')
+register('drseq', 'algorithms', 'DRSeqRendezvous')
+register('crseq', 'algorithms', 'CRSeqRendezvous')
+register('ex', 'algorithms', 'LowestIdFirstExhaustiveSearch', with_id=True)
+register('rex', 'algorithms', 'RandomizedExhaustiveSearch', with_id=True)
+register('lidfex', 'algorithms', 'LowestIdFirstExhaustiveSearch', with_id=True)
+register('hidfex', 'algorithms', 'HighestIdFirstExhaustiveSearch', with_id=True)
+register('lgfex', 'algorithms', 'LargestGapFirstExhaustiveSearch', with_id=True)
+register('sgfex', 'algorithms', 'SmallestGapFirstExhaustiveSearch', with_id=True)
+register('eofex', 'algorithms', 'EvenOddFirstExhaustiveSearch', with_id=True)
@@ -16,14 +16,12 @@
 # Copyright 2014 Andre Puschmann <andre.puschmann@tu-ilmenau.de>
 
 import sys
-import numpy as np
-from environment import Environment
-from helper import MinMaxMonitor,isEqual,string_splitter,areNeighborChannels
+from simulation import Config,simulate,RANDOM_SEED
+from helper import string_splitter,addTargetCiOption
+from profiler import writeProfiles
+from resultstore import ResultStoreWriter
 from optparse import OptionParser
 
-RANDOM_SEED = 42
-MAX_SLOTS = 39999
-
 def main():
     usage = "usage: %prog [options] arg"
     parser = OptionParser(usage)
@@ -50,6 +48,35 @@ def main():
                       help="Probability that a beacon received in an adjacent channel can be detected")
     parser.add_option("-u", "--tune", dest="tunetime", default=0.1,
                       help="How long tuning to given channel takes")
+    parser.add_option("-e", "--engine", dest="engine", default="slot",
+                      help="Which simulation engine to use (slot or batch)")
+    parser.add_option("-x", "--exact", dest="exact", default=False, action="store_true",
+                      help="Evaluate deterministic algorithms exactly over all asynchronous start offsets")
+    parser.add_option("--analytic-random", dest="analytic_random", default=False, action="store_true",
+                      help="Sample the TTR of the random algorithm from its geometric distribution instead of simulating slots (two nodes only)")
+    parser.add_option("-j", "--jobs", dest="jobs", type="int", default=1,
+                      help="How many worker processes to use")
+    addTargetCiOption(parser)
+    parser.add_option("--time-budget", dest="time_budget", type="float", default=None,
+                      help="Stop after this many seconds, -i is the maximum number of iterations")
+    parser.add_option("--cache", dest="cache_dir", metavar="DIR", default=None,
+                      help="Take results from a result cache in DIR and add new ones to it")
+    parser.add_option("--checkpoint", dest="checkpoint", metavar="FILE", default=None,
+                      help="Save the state of the simulation to FILE every minute")
+    parser.add_option("--resume", dest="resume", default=False, action="store_true",
+                      help="Continue from the checkpoint in FILE if it belongs to the same simulation")
+    parser.add_option("--record-maps", dest="record_maps", metavar="FILE",
+                      help="Record the channel maps of all iterations to a binary corpus")
+    parser.add_option("--replay-maps", dest="replay_maps", metavar="FILE",
+                      help="Replay the channel maps of a recorded corpus, its channel model replaces -m, -c, -g, -n, -t and -b")
+    parser.add_option("--raw-trials", dest="raw_trials", metavar="DIR",
+                      help="Store the TTR, start offset and outcome of every trial in a columnar store")
+    parser.add_option("--trace-events", dest="trace_events", metavar="FILE",
+                      help="Write the channel of every node in every slot to a binary trace")
+    parser.add_option("--profile", dest="profile", metavar="FILE", default=None,
+                      help="Print the wall time, slots per second and peak memory growth of each phase to stderr and write them as JSON to FILE")
+    parser.add_option("--store", dest="store", metavar="DIR", default=None,
+                      help="Append the result rows to the columnar result store in DIR")
     parser.add_option("-s", "--summary", dest="summary", default=False,
                       help="Whether to print simulations parameter summary at end")
     parser.add_option("-q", "--quiet",
@@ -58,116 +85,53 @@ def main():
     parser.add_option("-f", "--file", dest="file",
                       help="Write output to file", metavar="FILE")
     
-    # turn command line parameters into local variables
+    # turn command line parameters into a simulation config
     (options, args) = parser.parse_args()
-    model = options.model
-    models = ['symmetric', 'asymmetric']
-    if model not in models:
-        print "Channel model %s not supported." % model
-        sys.exit()
-    
-    num_overlap_channels = int(options.overlap_channels)
-    num_channels = int(options.channels)
-    theta = options.theta
-    block_width = options.block_width
-    acdp = options.acdp
-    # Reset number of overlapping to number of total channels in sync mode
-    if num_overlap_channels != num_channels and model == 'symmetric':
-        num_overlap_channels = num_channels
-    if num_channels < num_overlap_channels: num_overlap_channels = num_channels     
-
-    num_nodes = int(options.nodes)
-    num_iterations = int(options.iterations)
-    algorithms = options.algorithm
-    has_random_replace = options.randomreplace
-    verbose = options.verbose
+    config = Config(algorithms=options.algorithm,
+                    model=options.model,
+                    num_channels=int(options.channels),
+                    num_overlap_channels=int(options.overlap_channels),
+                    num_nodes=int(options.nodes),
+                    theta=options.theta,
+                    block_width=options.block_width,
+                    acdp=options.acdp,
+                    iterations=int(options.iterations),
+                    has_random_replace=options.randomreplace,
+                    engine=options.engine,
+                    exact=options.exact,
+                    analytic_random=options.analytic_random,
+                    jobs=options.jobs,
+                    target_ci=options.target_ci,
+                    time_budget=options.time_budget,
+                    cache_dir=options.cache_dir,
+                    checkpoint=options.checkpoint,
+                    resume=options.resume,
+                    seed=RANDOM_SEED,
+                    verbose=options.verbose,
+                    record_maps=options.record_maps,
+                    replay_maps=options.replay_maps,
+                    raw_trials=options.raw_trials,
+                    trace_events=options.trace_events,
+                    profile=bool(options.profile))
 
-    # Initialize seed, this helps reproducing the results
-    np.random.seed(RANDOM_SEED)
-
-    # Prepare statistics collection in dictionaries
-    ttr = {}
-    for alg in algorithms:
-        ttr[alg] = MinMaxMonitor()
-    
-    # Create simulation environment
-    env = Environment(model, num_channels, num_overlap_channels, num_nodes, theta, block_width, verbose)
-    
-    for run in range(num_iterations):
-        # reinitialize in each iteration (causes creation of new channels and nodes)
-        env.initialize()
-        
-        nodes = env.getNodes()
-
-        # Start rendezvous asynchronously, select node and number of iterations randomly
-        async_slots = np.random.randint(1, num_channels * num_channels)
-        #print "async_slots: %d" % async_slots
-        #async_node = np.random.randint(0, num_nodes)
-        async_node = 1 # Always let Node 1 start first to make sure this is the Master in centralized mode
-        
-        # Draw a random number that decides whether beacons on a neighbor channel can be detected
-        neighbordetect_random = np.random.random_sample()
-        
-        # Evaluate each algorithm using the same environment
-        for alg in algorithms:
-            # Initialize nodes with actual algorithm
-            env.initializeNodes(alg, has_random_replace)
-
-            # asynchronous start
-            for k in range(async_slots):
-                nodes[async_node].getNextChannel()
-            
-            connected = False
-            slot = 1
-            while not connected:
-                # For each node, get selected channel in this round
-                current_channels = []
-                for node in nodes:
-                    current_channels.append(node.getNextChannel(slot))
-
-                # Check if all nodes have selected the same channel
-                if isEqual(current_channels):
-                    #print "Rendezvous after %d slots in Channel %d." % (slot, current_channels[0].getId())
-                    ttr[alg].tally(slot)
-                    connected = True
-                slot += 1
-                
-                # Check if two nodes have selected direct neighbors
-                if areNeighborChannels(current_channels):
-                    # make sure we detect such a situation only with a certain probability
-                    if neighbordetect_random <= acdp:
-                        # check, assume rendezvous has happened on two adjacent channels
-                        # but for fairness add two more slots that are 
-                        # needed to beacon on upper and lower neighbor (worst case)
-                        slot += 2
-                        ttr[alg].tally(slot)
-                        connected = True
-                else:
-                    # FIXME: take probability of false alarm into account here
-                    pass
-                
-                # Sanity check, after MAX_SLOTS, stop process
-                if slot > MAX_SLOTS:
-                    connected = True
-    
-    for alg in algorithms:
-        num_ok = ttr[alg].len()
-        num_failed = num_iterations - ttr[alg].len()
-        if ttr[alg].len():
-            # alg  num_channels   num_overlap_channels   num_iterations   num_ok   num_ok   ttr_min   ttr_mean   ttr_max   ttr_std   block_width   acdp   theta
-            print "%s\t%d\t%d\t%d\t%d\t%d\t%.2f\t%.2f\t%.2f\t%.2f\t%d\t%.2f\t%.2f" % \
-                        (alg, num_channels, num_overlap_channels, num_iterations, num_ok, num_failed, 
-                        ttr[alg].min(), ttr[alg].mean(), ttr[alg].max(), ttr[alg].std(),
-                        block_width, acdp, theta)
-            # uncomment the three lines below to get the raw TTR values
-            #raw_values = ttr[alg].get()
-            #for i in raw_values:
-            #    print "%.2f" % (i)
-        else:
-            print "No statistics collected."
+    # Run simulation, each iteration derives its random numbers from the seed
+    try:
+        result = simulate(config)
+    except (ValueError, RuntimeError) as e:
+        print e
+        sys.exit()
 
-    
-    env.writeChannelMapsToFile()
+    if result.profile:
+        start = result.profile.start()
+    for row in result.formatRows():
+        print row
+    if options.store:
+        store = ResultStoreWriter(options.store)
+        store.appendResult(result)
+        store.close()
+    if result.profile:
+        result.profile.stop(start, 'output')
+        writeProfiles(options.profile, [(vars(result.config), result.profile)])
     
 
 if __name__ == "__main__":
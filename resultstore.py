@@ -0,0 +1,258 @@
+#!/usr/bin/env python
+#
+# This file is part of RendezvousSim. RendezvousSim is free software: you can
+# redistribute it and/or modify it under the terms of the GNU General Public
+# License as published by the Free Software Foundation, version 2.
+#
+# This program is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE.  See the GNU General Public License for more
+# details.
+#
+# You should have received a copy of the GNU General Public License along with
+# this program; if not, write to the Free Software Foundation, Inc., 51
+# Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+#
+# Copyright 2014 Andre Puschmann <andre.puschmann@tu-ilmenau.de>
+
+"""
+Columnar store for the result rows of many simulations and sweeps. A store is
+a directory with a meta.json file and one shard per run that appended to it.
+Each column of a shard is a plain .npy file, e.g. 00000.ttr_mean.npy, and the
+rows of a shard are sorted by the key columns (alg, M, G, bw, theta, acdp).
+New runs add shards, existing shards are never rewritten.
+
+ Columns (as in the rows printed by the simulator):
+ alg                        index of the algorithm in the algorithms list of meta.json
+ max_num_channels           M
+ num_overlapping_channels   G
+ num_it, num_it_ok, num_it_nok
+ ttr_min, ttr_mean, ttr_max, ttr_std
+ bw, acdp, theta
+ ttr_p50, ttr_p95, ttr_p99
+
+If a point was simulated more than once, getSeries() uses the row that was
+added last.
+
+ Example:
+ $ ./resultstore.py -o results example.dat
+ table = ResultStore('results').getTable()
+ (algs, x, ttr) = table.select(max_num_channels=80).getSeries('num_overlapping_channels', 'ttr_mean')
+"""
+
+import os
+import json
+import numpy as np
+from optparse import OptionParser
+from trialstore import ShardedStore,META_FILE
+
+COLUMNS = [('alg', np.int16), ('max_num_channels', np.int64), ('num_overlapping_channels', np.int64),
+           ('num_it', np.int64), ('num_it_ok', np.int64), ('num_it_nok', np.int64),
+           ('ttr_min', np.float64), ('ttr_mean', np.float64), ('ttr_max', np.float64), ('ttr_std', np.float64),
+           ('bw', np.int64), ('acdp', np.float64), ('theta', np.float64),
+           ('ttr_p50', np.float64), ('ttr_p95', np.float64), ('ttr_p99', np.float64)]
+KEY_COLUMNS = ['alg', 'max_num_channels', 'num_overlapping_channels', 'bw', 'theta', 'acdp']
+
+# Columns of old result files without percentiles
+NUM_REQUIRED_COLUMNS = 13
+
+
+# The rows of a result file or store as one array per column
+class ResultTable():
+    def __init__(self, algorithms, columns):
+        self.algorithms = list(algorithms)
+        self.columns = columns
+
+    def getAlgorithms(self):
+        return self.algorithms
+
+    def getColumn(self, name):
+        return self.columns[name]
+
+    def len(self):
+        return self.columns['alg'].size
+
+    # Return the table of the rows matching all given values, alg may be a
+    # name or a list of names
+    def select(self, **values):
+        mask = np.ones(self.len(), dtype=bool)
+        for (name, value) in values.items():
+            if value is None:
+                continue
+            if name == 'alg':
+                names = [value] if isinstance(value, basestring) else value
+                codes = [self.algorithms.index(alg) for alg in names if alg in self.algorithms]
+                mask &= np.in1d(self.columns['alg'], codes)
+            else:
+                mask &= self.columns[name] == value
+        return ResultTable(self.algorithms, dict((name, column[mask]) for (name, column) in self.columns.items()))
+
+    # Return the algorithms in the order of their first row
+    def getAlgorithmsInOrder(self):
+        (codes, first) = np.unique(self.columns['alg'], return_index=True)
+        return [self.algorithms[code] for code in codes[np.argsort(first)]]
+
+    # Return the distinct combinations of the given columns and, for every
+    # row, the index of its combination
+    def groupBy(self, names):
+        codes = []
+        uniques = []
+        for name in names:
+            (values, inverse) = np.unique(self.columns[name], return_inverse=True)
+            uniques.append(values)
+            codes.append(inverse)
+        shape = tuple(max(values.size, 1) for values in uniques)
+        (groups, inverse) = np.unique(np.ravel_multi_index(codes, shape), return_inverse=True)
+        indexes = np.unravel_index(groups, shape)
+        return (dict((name, values[index]) for (name, values, index) in zip(names, uniques, indexes)), inverse)
+
+    # Return the algorithms, the sorted x values and a matrix of the y column
+    # with one row per algorithm and one column per x value, NaN where an
+    # algorithm has no result
+    def getSeries(self, x, y):
+        algs = self.getAlgorithmsInOrder()
+        x_values = np.unique(self.columns[x])
+        (groups, inverse) = self.groupBy(['alg', x])
+        # row of every group that was added last
+        last = np.full(groups['alg'].size, -1, dtype=np.int64)
+        np.maximum.at(last, inverse, np.arange(self.len()))
+        rows = np.zeros(len(self.algorithms), dtype=np.int64)
+        rows[[self.algorithms.index(alg) for alg in algs]] = np.arange(len(algs))
+        series = np.full((len(algs), x_values.size), np.nan)
+        series[rows[groups['alg']], np.searchsorted(x_values, groups[x])] = self.columns[y][last]
+        return (algs, x_values, series)
+
+
+# Return the empty columns of a table
+def createColumns(size=0):
+    return dict((name, np.zeros(size, dtype=dtype)) for (name, dtype) in COLUMNS)
+
+
+# Read a tab separated result file as printed by the simulator, rows without
+# statistics are skipped
+def readResultFile(filename):
+    num_columns = NUM_REQUIRED_COLUMNS
+    with open(filename) as f:
+        for line in f:
+            if line.strip() and not line.startswith('#'):
+                num_columns = min(len(line.rstrip('\n').split('\t')), len(COLUMNS))
+                break
+    dtype = [('alg', 'S32')] + COLUMNS[1:num_columns]
+    data = np.atleast_1d(np.genfromtxt(filename, comments="#", delimiter='\t', usecols=range(num_columns),
+                                       dtype=dtype, invalid_raise=False))
+    names = np.char.strip(data['alg'])
+    data = data[names != '']
+    # number the algorithms in the order of their first row
+    (algorithms, first, codes) = np.unique(names[names != ''], return_index=True, return_inverse=True)
+    order = np.argsort(first)
+    columns = createColumns(data.size)
+    columns['alg'] = np.argsort(order)[codes].astype(np.int16)
+    for (name, dtype) in COLUMNS[1:]:
+        if name in data.dtype.names:
+            columns[name] = data[name].astype(dtype)
+        else:
+            columns[name][:] = np.nan
+    return ResultTable([str(alg) for alg in algorithms[order]], columns)
+
+
+# Appends the rows of one run to a new or existing store as a new shard
+class ResultStoreWriter():
+    def __init__(self, dirname):
+        self.dirname = dirname
+        if not os.path.isdir(dirname):
+            os.makedirs(dirname)
+        filename = os.path.join(dirname, META_FILE)
+        if os.path.exists(filename):
+            with open(filename) as f:
+                self.meta = json.load(f)
+        else:
+            self.meta = {'algorithms': [],
+                         'columns': [name for (name, dtype) in COLUMNS],
+                         'shards': []}
+        self.rows = []
+        self.chunks = []
+
+    def getAlgorithmIndex(self, alg):
+        if alg not in self.meta['algorithms']:
+            self.meta['algorithms'].append(alg)
+        return self.meta['algorithms'].index(alg)
+
+    # Add a row as returned by Result.getRow()
+    def appendRow(self, row):
+        self.rows.append((self.getAlgorithmIndex(row[0]),) + tuple(row[1:]))
+
+    # Add all rows of a simulation Result
+    def appendResult(self, result):
+        for (alg, pair) in result.getRowKeys():
+            row = result.getRow(alg, pair)
+            if row:
+                self.appendRow(row)
+
+    # Add all rows of a table, e.g. one read by readResultFile()
+    def appendTable(self, table):
+        codes = np.array([self.getAlgorithmIndex(alg) for alg in table.getAlgorithms()] or [0], dtype=np.int16)
+        chunk = dict((name, table.getColumn(name)) for (name, dtype) in COLUMNS)
+        chunk['alg'] = codes[chunk['alg']]
+        self.chunks.append(chunk)
+
+    def getColumns(self):
+        chunks = list(self.chunks)
+        if self.rows:
+            chunks.append(dict((name, np.array([row[k] for row in self.rows], dtype=dtype))
+                               for (k, (name, dtype)) in enumerate(COLUMNS)))
+        if not chunks:
+            return createColumns()
+        return dict((name, np.concatenate([chunk[name] for chunk in chunks]).astype(dtype)) for (name, dtype) in COLUMNS)
+
+    def close(self):
+        columns = self.getColumns()
+        if columns['alg'].size:
+            order = np.lexsort([columns[name] for name in reversed(KEY_COLUMNS)])
+            shard = "%05d" % len(self.meta['shards'])
+            for (name, dtype) in COLUMNS:
+                np.save(os.path.join(self.dirname, "%s.%s.npy" % (shard, name)), columns[name][order])
+            self.meta['shards'].append({'name': shard, 'rows': int(columns['alg'].size)})
+        self.rows = []
+        self.chunks = []
+        with open(os.path.join(self.dirname, META_FILE), 'w') as f:
+            json.dump(self.meta, f, indent=1, sort_keys=True)
+
+
+# Read-only access to a result store, all columns are memory-mapped
+class ResultStore(ShardedStore):
+    columns = COLUMNS
+
+    def len(self):
+        return sum(shard['rows'] for shard in self.meta['shards'])
+
+    # Return all rows as one table, results are small enough to be read at once
+    def getTable(self):
+        return ResultTable(self.algorithms, dict((name, np.concatenate([np.zeros(0, dtype=dtype)] + self.getShards(name)))
+                                                 for (name, dtype) in COLUMNS))
+
+
+# Return the table of a result store directory or a tab separated result file
+def readResults(path):
+    if os.path.isdir(path):
+        return ResultStore(path).getTable()
+    return readResultFile(path)
+
+
+def main():
+    usage = "usage: %prog -o DIR FILE..."
+    parser = OptionParser(usage)
+    parser.add_option("-o", "--output", dest="store", metavar="DIR",
+                      help="Append the rows of the result files to the store in DIR")
+    (options, args) = parser.parse_args()
+    if not options.store or not args:
+        parser.error("Incorrect number of arguments")
+
+    writer = ResultStoreWriter(options.store)
+    for filename in args:
+        writer.appendTable(readResultFile(filename))
+    writer.close()
+    print "%s holds %d rows." % (options.store, ResultStore(options.store).len())
+
+
+if __name__ == "__main__":
+    main()
@@ -15,10 +15,18 @@
 #
 # Copyright 2014 Andre Puschmann <andre.puschmann@tu-ilmenau.de>
 
-import subprocess
+from simulation import Config,HEADER
+from cache import DEFAULT_CACHE_DIR
+from sweep import sweep
 
-print "#alg\tM\tG\tnum_it\tnum_ok\tnum_nok\tTTRmin\tTTRmean\tTTRmax\tTTRstd"
+# for increasing G (number of overlapping channels) evaluate algorithms with fixed number of channels (c=80)
+CONFIG = Config(algorithms=['random', 'ex', 'js'], model='asymmetric', num_channels=80, theta=0.5,
+                iterations=1000, num_nodes=2, cache_dir=DEFAULT_CACHE_DIR)
+GRID = {'num_overlap_channels': range(1,21)}
 
-# for increasing G (number of overlapping channels) evaluate algorithms with fixed number of channels (c=20)
-for i in range(1,21):
-    subprocess.call(["./rendezvoussim2.py", "-c 80", "-a random,ex,js", "-i 1000", "-m", "asymmetric", "-t 0.5", "-q", "-n 2", "-g %d" % i])
+
+if __name__ == "__main__":
+    print HEADER
+    for result in sweep(CONFIG, GRID):
+        for row in result.formatRows():
+            print row
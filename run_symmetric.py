@@ -15,18 +15,21 @@
 #
 # Copyright 2014 Andre Puschmann <andre.puschmann@tu-ilmenau.de>
 
-import subprocess
+from simulation import Config,HEADER
+from cache import DEFAULT_CACHE_DIR
+from sweep import sweep
 
 i_value = 1000
 c_range = range(5,101,5)
 
-print "#alg\tM\tG\tnum_it\tnum_ok\tnum_nok\tTTRmin\tTTRmean\tTTRmax\tTTRstd\tbw\tacdp\ttheta"
-    
-for c_value in c_range:
-    subprocess.call(["./rendezvoussim2.py",
-                                "-c %d" % c_value,
-                                "-a random,ex,js",
-                                "-i %d" % i_value,
-                                "-m", "symmetric",
-                                "-q",
-                                "-n 2"])
+# all points are simulated in this process, results are taken from the cache if possible
+CONFIG = Config(algorithms=['random', 'ex', 'js'], model='symmetric', iterations=i_value, num_nodes=2,
+                cache_dir=DEFAULT_CACHE_DIR)
+GRID = {'num_channels': c_range}
+
+
+if __name__ == "__main__":
+    print HEADER
+    for result in sweep(CONFIG, GRID):
+        for row in result.formatRows():
+            print row
@@ -0,0 +1,452 @@
+#
+# This file is part of RendezvousSim. RendezvousSim is free software: you can
+# redistribute it and/or modify it under the terms of the GNU General Public
+# License as published by the Free Software Foundation, version 2.
+#
+# This program is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE.  See the GNU General Public License for more
+# details.
+#
+# You should have received a copy of the GNU General Public License along with
+# this program; if not, write to the Free Software Foundation, Inc., 51
+# Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+#
+# Copyright 2014 Andre Puschmann <andre.puschmann@tu-ilmenau.de>
+
+"""
+Library interface of the simulation. A simulation is described by a Config,
+simulate() runs it and returns a Result. Nothing is printed and no global
+state is touched, all random numbers are drawn from generators derived from
+the seed of the config.
+
+ Example:
+ config = Config(algorithms=['random', 'js'], num_channels=20, iterations=1000)
+ for row in simulate(config).formatRows():
+     print row
+"""
+
+import os
+import copy
+import math
+import time
+import itertools
+import numpy as np
+from environment import Environment
+from engine import SlotEngine,BatchEngine,ExactEngine,CHUNK_SIZE,ANALYTIC_ALGORITHM,drawChannelMaps
+from corpus import ChannelMapWriter,ChannelMapCorpus,packChannelMaps,PARAMETERS
+from trialstore import TrialLog,TrialStoreWriter
+from eventtrace import EventLog,EventTraceWriter
+from cache import ResultCache,isCacheable,restoreHistogram
+from checkpoint import Checkpoint,CHECKPOINT_INTERVAL
+from profiler import Profiler
+from helper import MinMaxMonitor,DistributionMonitor
+from registry import isRegistered
+
+RANDOM_SEED = 42
+
+HEADER = "#alg\tM\tG\tnum_it\tnum_ok\tnum_nok\tTTRmin\tTTRmean\tTTRmax\tTTRstd\tbw\tacdp\ttheta\tTTRp50\tTTRp95\tTTRp99"
+
+# alg  num_channels   num_overlap_channels   num_iterations   num_ok   num_ok   ttr_min   ttr_mean   ttr_max   ttr_std   block_width   acdp   theta   ttr_p50   ttr_p95   ttr_p99
+ROW_FORMAT = "%s\t%d\t%d\t%d\t%d\t%d\t%.2f\t%.2f\t%.2f\t%.2f\t%d\t%.2f\t%.2f\t%.2f\t%.2f\t%.2f"
+
+# Rows of the first slot in which any two nodes meet are labeled with this
+# suffix, they are only reported for groups of more than two nodes
+PAIR_SUFFIX = "-pair"
+
+# Two-sided 95% quantile of the normal distribution for the confidence interval of the mean TTR
+CI_QUANTILE = 1.96
+
+MODELS = ['symmetric', 'asymmetric']
+ENGINES = ['slot', 'batch']
+
+
+# All parameters of a simulation, the defaults match the command line
+class Config():
+    def __init__(self, algorithms=None, model='symmetric', num_channels=5, num_overlap_channels=5,
+                 num_nodes=2, theta=1.0, block_width=1, acdp=0.0, iterations=1,
+                 has_random_replace=False, engine='slot', exact=False, jobs=1,
+                 seed=RANDOM_SEED, verbose=False, record_maps=None, replay_maps=None, raw_trials=None,
+                 target_ci=None, time_budget=None, cache_dir=None, checkpoint=None, resume=False,
+                 trace_events=None, profile=False, analytic_random=False):
+        if algorithms is None:
+            algorithms = ['random']
+        self.algorithms = list(algorithms)
+        self.model = model
+        self.num_channels = num_channels
+        self.num_overlap_channels = num_overlap_channels
+        self.num_nodes = num_nodes
+        self.theta = theta
+        self.block_width = block_width
+        self.acdp = acdp
+        self.iterations = iterations
+        self.has_random_replace = has_random_replace
+        self.engine = engine
+        self.exact = exact
+        self.jobs = jobs
+        self.seed = seed
+        self.verbose = verbose
+        self.record_maps = record_maps # file name of a channel map corpus to write
+        self.replay_maps = replay_maps # file name of a channel map corpus to read
+        self.raw_trials = raw_trials # directory of a TrialStore for the record of every trial
+        self.target_ci = target_ci # stop an algorithm once the 95% CI half width is below this share of its mean TTR
+        self.time_budget = time_budget # stop all algorithms after this many seconds
+        self.cache_dir = cache_dir # directory of a ResultCache, or None
+        self.checkpoint = checkpoint # file name of a Checkpoint that is written periodically
+        self.resume = resume # continue from the checkpoint if it belongs to this simulation
+        self.trace_events = trace_events # file name of an EventTrace of all selected channels
+        self.profile = profile # collect a Profiler of the phases of the simulation
+        self.analytic_random = analytic_random # sample the TTR of the random algorithm instead of simulating slots
+
+    # Return a copy with some parameters changed
+    def copy(self, **changes):
+        config = copy.copy(self)
+        config.algorithms = list(self.algorithms)
+        for (key, value) in changes.items():
+            if not hasattr(config, key):
+                raise ValueError("Unknown simulation parameter %s." % key)
+            setattr(config, key, value)
+        return config
+
+    def validate(self):
+        if self.model not in MODELS:
+            raise ValueError("Channel model %s not supported." % self.model)
+        if self.engine not in ENGINES:
+            raise ValueError("Simulation engine %s not supported." % self.engine)
+        for alg in self.algorithms:
+            if not isRegistered(alg.strip()):
+                raise ValueError("Rendezvous algorithm %s is not supported." % alg.strip())
+
+        # Reset number of overlapping to number of total channels in sync mode
+        if self.num_overlap_channels != self.num_channels and self.model == 'symmetric':
+            self.num_overlap_channels = self.num_channels
+        if self.num_channels < self.num_overlap_channels:
+            self.num_overlap_channels = self.num_channels
+        if (self.record_maps and self.replay_maps and
+                os.path.abspath(self.record_maps) == os.path.abspath(self.replay_maps)):
+            raise ValueError("Can't record to the channel map corpus that is replayed.")
+        if self.raw_trials and self.exact:
+            raise ValueError("Raw trial records are not supported in exact evaluation.")
+        if self.trace_events and self.exact:
+            raise ValueError("Event traces are not supported in exact evaluation.")
+        if self.target_ci is not None and self.target_ci <= 0:
+            raise ValueError("Target confidence interval must be positive.")
+        if self.time_budget is not None and self.time_budget <= 0:
+            raise ValueError("Time budget must be positive.")
+        if self.resume and not self.checkpoint:
+            raise ValueError("Resuming requires a checkpoint file.")
+        if self.exact and self.num_nodes != 2:
+            raise ValueError("Exact evaluation is only supported for two nodes.")
+        if self.analytic_random and self.exact:
+            raise ValueError("The analytic TTR of the random algorithm is not supported in exact evaluation.")
+        if self.analytic_random and self.num_nodes != 2:
+            raise ValueError("The analytic TTR of the random algorithm is only supported for two nodes.")
+        if self.analytic_random and self.trace_events and ANALYTIC_ALGORITHM in self.algorithms:
+            raise ValueError("Event traces of the random algorithm are not supported with its analytic TTR.")
+        if self.checkpoint and (self.record_maps or self.raw_trials or self.trace_events):
+            raise ValueError("Checkpoints are not supported while recording channel maps, raw trials or events.")
+
+    # Take the channel model of a recorded corpus, the iterations must not
+    # exceed the number of recorded maps
+    def adoptChannelMapCorpus(self, corpus):
+        for (key, value) in corpus.getParameters().items():
+            if isinstance(value, unicode):
+                value = str(value)
+            setattr(self, key, value)
+        if self.iterations > corpus.len():
+            raise ValueError("Corpus %s only holds %d channel maps." % (corpus.filename, corpus.len()))
+
+
+# The TTR statistics of all algorithms of a simulation. For groups of more
+# than two nodes, the TTR of the first pair of nodes is kept as well. If the
+# config enables profiling, profile holds the Profiler of the simulation.
+class Result():
+    def __init__(self, config, ttr, pair_ttr=None, iterations=None, profile=None):
+        self.config = config
+        self.ttr = ttr
+        self.pair_ttr = pair_ttr or {}
+        if iterations is None:
+            iterations = dict((alg, config.iterations) for alg in config.algorithms)
+        self.iterations = iterations
+        self.profile = profile
+
+    # Number of iterations that were simulated for the given algorithm
+    def getIterations(self, alg):
+        return self.iterations[alg]
+
+    def getMonitor(self, alg):
+        return self.ttr[alg]
+
+    def getPairMonitor(self, alg):
+        return self.pair_ttr[alg]
+
+    # Return the output row of the given algorithm as tuple, or None if no statistics were collected
+    def getRow(self, alg, pair=False):
+        config = self.config
+        if pair:
+            monitor = self.pair_ttr[alg]
+            label = alg + PAIR_SUFFIX
+        else:
+            monitor = self.ttr[alg]
+            label = alg
+        if not monitor.len():
+            return None
+        num_ok = monitor.len()
+        num_failed = self.iterations[alg] - num_ok
+        return (label, config.num_channels, config.num_overlap_channels, self.iterations[alg], num_ok, num_failed,
+                monitor.min(), monitor.mean(), monitor.max(), monitor.std(),
+                config.block_width, config.acdp, config.theta,
+                monitor.percentile(50), monitor.percentile(95), monitor.percentile(99))
+
+    # Return the (alg, pair) arguments of getRow() for all output rows, the
+    # pair row of an algorithm follows its own row
+    def getRowKeys(self):
+        keys = []
+        for alg in self.config.algorithms:
+            keys.append((alg, False))
+            if alg in self.pair_ttr:
+                keys.append((alg, True))
+        return keys
+
+    # Return the tab separated output lines of all algorithms
+    def formatRows(self):
+        rows = []
+        for (alg, pair) in self.getRowKeys():
+            row = self.getRow(alg, pair)
+            if row:
+                rows.append(ROW_FORMAT % row)
+            else:
+                rows.append("No statistics collected.")
+        return rows
+
+
+def createMonitor(config):
+    if config.exact:
+        return DistributionMonitor()
+    return MinMaxMonitor()
+
+
+# The first pair TTR is only collected for groups of more than two nodes
+def hasPairStatistics(config):
+    return config.num_nodes > 2 and not config.exact
+
+
+# Simulates the given iterations of the given algorithms in a new environment
+# and returns the TTR monitors of all algorithms and of their first pairs,
+# together with the bit-packed channel maps, the columns of the trial records,
+# the events and the profile if they are recorded. This is the unit of work
+# that is distributed over the process pool.
+def runIterations(args):
+    (config, iterations, algorithms) = args
+    profiler = None
+    if config.profile:
+        profiler = Profiler()
+        start = profiler.start()
+    env = Environment(config.model, config.num_channels, config.num_overlap_channels,
+                      config.num_nodes, config.theta, config.block_width, config.verbose)
+    if config.replay_maps:
+        env.useChannelMapCorpus(ChannelMapCorpus(config.replay_maps))
+    channel_maps = drawChannelMaps(env, config.seed, iterations)
+    if profiler:
+        profiler.stop(start, 'environment')
+    ttr = dict((alg, createMonitor(config)) for alg in algorithms)
+    pair_ttr = None
+    if hasPairStatistics(config):
+        pair_ttr = dict((alg, MinMaxMonitor()) for alg in algorithms)
+
+    if config.exact:
+        engine = ExactEngine
+    elif config.engine == 'slot':
+        engine = SlotEngine
+    else:
+        engine = BatchEngine
+    trials = None
+    if config.raw_trials:
+        trials = TrialLog(config.algorithms)
+    events = None
+    if config.trace_events:
+        events = EventLog(config.algorithms)
+    engine(env, config.seed, config.acdp, config.has_random_replace,
+           config.verbose, trials, events, profiler, config.analytic_random).run(algorithms, iterations, ttr,
+                                                                                 channel_maps, pair_ttr)
+
+    packed_maps = None
+    if config.record_maps:
+        packed_maps = packChannelMaps(channel_maps)
+    if trials is not None:
+        trials = trials.getColumns()
+    if events is not None:
+        events = events.getEvents()
+    return (ttr, pair_ttr, packed_maps, trials, events, profiler)
+
+
+# Return True once an algorithm needs no more iterations, i.e. the confidence
+# interval of its mean TTR is narrow enough or the time budget is spent
+def isFinished(config, monitor, start_time):
+    if config.time_budget is not None and time.time() - start_time >= config.time_budget:
+        return True
+    if config.target_ci is not None and monitor.len() > 1:
+        half_width = CI_QUANTILE * monitor.std() / math.sqrt(monitor.len())
+        return half_width <= config.target_ci * monitor.mean()
+    return False
+
+
+# Runs all iterations in chunks, either in this process or spread over a pool
+# of worker processes. The channel maps of a chunk are drawn at once, all
+# other random numbers of an iteration come from its own stream. Streams are
+# derived from the seed and chunks are merged in order, so the result doesn't
+# depend on the number of jobs. Recorded channel maps and trial records are
+# streamed to disk in the same order.
+#
+# With a target confidence interval or a time budget, each algorithm is
+# checked after every chunk and is left out of the following chunks once it is
+# finished. Chunks are then handed out in waves of one chunk per job, and the
+# chunks of a wave that follow the one an algorithm finished in are discarded
+# for it. Returns the monitors, the number of iterations of each algorithm and
+# the merged profile of all chunks, or None if profiling is off.
+#
+# The state after each chunk can be saved to a checkpoint, a resumed run
+# continues with the next chunk.
+def runParallel(config):
+    starts = range(0, config.iterations, CHUNK_SIZE)
+    sequential = config.target_ci is not None or config.time_budget is not None
+    wave_size = max(config.jobs if sequential else len(starts), 1)
+    pool = None
+    if config.jobs > 1:
+        import multiprocessing
+        pool = multiprocessing.Pool(config.jobs)
+
+    writer = None
+    if config.record_maps:
+        writer = ChannelMapWriter(config.record_maps, dict((key, getattr(config, key)) for key in PARAMETERS))
+    trial_writer = None
+    if config.raw_trials:
+        trial_writer = TrialStoreWriter(config.raw_trials, config.algorithms,
+                                        dict((key, getattr(config, key)) for key in PARAMETERS + ['acdp', 'seed']))
+    event_writer = None
+    if config.trace_events:
+        event_writer = EventTraceWriter(config.trace_events, config.algorithms)
+
+    start_time = time.time()
+    first = 0
+    active = list(config.algorithms)
+    iterations = dict((alg, 0) for alg in config.algorithms)
+    ttr = dict((alg, createMonitor(config)) for alg in config.algorithms)
+    pair_ttr = None
+    if hasPairStatistics(config):
+        pair_ttr = dict((alg, MinMaxMonitor()) for alg in config.algorithms)
+    checkpoint = None
+    if config.checkpoint:
+        checkpoint = Checkpoint(config.checkpoint, config)
+    if config.resume:
+        state = checkpoint.load(lambda: createMonitor(config), MinMaxMonitor)
+        if state:
+            first = state['cursor']
+            active = state['active']
+            iterations = state['iterations']
+            (ttr, pair_ttr) = (state['ttr'], state['pair_ttr'])
+            start_time -= state['elapsed']
+    last_checkpoint = time.time()
+    profiler = None
+    if config.profile:
+        profiler = Profiler()
+
+    try:
+        for wave_start in range(first, len(starts), wave_size):
+            if not active:
+                break
+            chunks = [(config, range(start, min(start + CHUNK_SIZE, config.iterations)), list(active))
+                      for start in starts[wave_start:wave_start + wave_size]]
+            if pool:
+                results = pool.imap(runIterations, chunks)
+            else:
+                results = (runIterations(chunk) for chunk in chunks)
+
+            for (index, chunk, chunk_result) in itertools.izip(itertools.count(wave_start), chunks, results):
+                (_, chunk_iterations, chunk_algorithms) = chunk
+                (chunk_ttr, chunk_pair_ttr, chunk_maps, chunk_trials, chunk_events, chunk_profiler) = chunk_result
+                algorithms = [alg for alg in chunk_algorithms if alg in active]
+                if not algorithms:
+                    continue
+                if profiler:
+                    profiler.merge(chunk_profiler)
+                    merge_start = profiler.start()
+                for alg in algorithms:
+                    ttr[alg].merge(chunk_ttr[alg])
+                    if pair_ttr:
+                        pair_ttr[alg].merge(chunk_pair_ttr[alg])
+                for alg in algorithms:
+                    iterations[alg] += len(chunk_iterations)
+                if writer:
+                    writer.appendPacked(chunk_maps)
+                kept_algorithms = [config.algorithms.index(alg) for alg in algorithms]
+                if trial_writer:
+                    if len(algorithms) < len(chunk_algorithms):
+                        kept = np.in1d(chunk_trials['alg'], kept_algorithms)
+                        chunk_trials = dict((name, column[kept]) for (name, column) in chunk_trials.items())
+                    trial_writer.append(chunk_trials)
+                if event_writer:
+                    if len(algorithms) < len(chunk_algorithms):
+                        chunk_events = chunk_events[np.in1d(chunk_events['alg'], kept_algorithms)]
+                    event_writer.append(chunk_events)
+                if profiler:
+                    profiler.stop(merge_start, 'merge')
+                if sequential:
+                    active = [alg for alg in active if not isFinished(config, ttr[alg], start_time)]
+                if checkpoint and (time.time() - last_checkpoint >= CHECKPOINT_INTERVAL or index == len(starts) - 1):
+                    checkpoint.save(index + 1, active, iterations, ttr, pair_ttr, time.time() - start_time)
+                    last_checkpoint = time.time()
+    finally:
+        if writer:
+            writer.close()
+        if trial_writer:
+            trial_writer.close()
+        if event_writer:
+            event_writer.close()
+        if pool:
+            pool.close()
+            pool.join()
+    return (ttr, pair_ttr, iterations, profiler)
+
+
+def simulate(config):
+    config = config.copy()
+    if config.replay_maps:
+        config.adoptChannelMapCorpus(ChannelMapCorpus(config.replay_maps))
+    config.validate()
+    if config.cache_dir and isCacheable(config):
+        return simulateCached(config, ResultCache(config.cache_dir))
+    (ttr, pair_ttr, iterations, profiler) = runParallel(config)
+    return Result(config, ttr, pair_ttr, iterations, profiler)
+
+
+# Take the results of all cached algorithms from the cache, simulate the
+# others and add them to the cache
+def simulateCached(config, cache):
+    ttr = {}
+    pair_ttr = {}
+    iterations = {}
+    missing = []
+    profiler = None
+    for alg in config.algorithms:
+        entry = cache.get(config, alg)
+        if entry is None:
+            if alg not in missing:
+                missing.append(alg)
+            continue
+        ttr[alg] = restoreHistogram(createMonitor(config), entry['ttr'])
+        if entry['pair_ttr'] is not None:
+            pair_ttr[alg] = restoreHistogram(MinMaxMonitor(), entry['pair_ttr'])
+        iterations[alg] = entry['iterations']
+
+    if missing:
+        (new_ttr, new_pair_ttr, new_iterations, profiler) = runParallel(config.copy(algorithms=missing))
+        for alg in missing:
+            ttr[alg] = new_ttr[alg]
+            iterations[alg] = new_iterations[alg]
+            if new_pair_ttr:
+                pair_ttr[alg] = new_pair_ttr[alg]
+            cache.put(config, alg, iterations[alg], ttr[alg], pair_ttr.get(alg))
+    if config.profile and profiler is None:
+        profiler = Profiler()
+    return Result(config, ttr, pair_ttr, iterations, profiler)
@@ -0,0 +1,155 @@
+#!/usr/bin/env python
+#
+# This file is part of RendezvousSim. RendezvousSim is free software: you can
+# redistribute it and/or modify it under the terms of the GNU General Public
+# License as published by the Free Software Foundation, version 2.
+#
+# This program is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE.  See the GNU General Public License for more
+# details.
+#
+# You should have received a copy of the GNU General Public License along with
+# this program; if not, write to the Free Software Foundation, Inc., 51
+# Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+#
+# Copyright 2014 Andre Puschmann <andre.puschmann@tu-ilmenau.de>
+
+"""
+Runs a parameter sweep inside one process. The grid maps parameter names of
+the simulation Config to lists of values, every combination of values is one
+sweep point. The values for 'algorithms' are lists of algorithm names that are
+simulated together.
+
+ Example:
+ $ ./sweep.py -c 80 -m asymmetric -t 0.5 -g 1,2,3,4,5 -a random,ex,js -i 1000
+"""
+
+import sys
+import itertools
+from simulation import Config,simulate,HEADER
+from helper import string_splitter,addTargetCiOption
+from profiler import writeProfiles
+from resultstore import ResultStoreWriter
+from optparse import OptionParser
+
+# Parameters that can be swept, points are expanded in this order
+GRID_PARAMETERS = ['algorithms', 'num_channels', 'num_overlap_channels', 'theta', 'block_width', 'acdp']
+
+
+# Return the config of each point of the grid
+def expandGrid(config, grid):
+    for key in grid:
+        if key not in GRID_PARAMETERS:
+            raise ValueError("Parameter %s can't be swept." % key)
+    keys = [key for key in GRID_PARAMETERS if key in grid]
+    for values in itertools.product(*[grid[key] for key in keys]):
+        yield config.copy(**dict(zip(keys, values)))
+
+
+# Simulate each point of the grid, yields one Result per point
+def sweep(config, grid):
+    for point in expandGrid(config, grid):
+        yield simulate(point)
+
+
+def main():
+    usage = "usage: %prog [options] arg"
+    parser = OptionParser(usage)
+    parser.add_option("-a", "--algorithm", dest="algorithm", default=["random"],
+                      help="Which rendezvous algorithm to simulate",
+                      type='string', action='callback', callback=string_splitter)
+    parser.add_option("-c", "--channels", dest="channels", default=["5"],
+                      help="Comma separated list of the number of channels (the M parameter)",
+                      type='string', action='callback', callback=string_splitter)
+    parser.add_option("-m", "--model", dest="model", default="symmetric",
+                      help="Which channel model to use (symmetric or asymmetric)")
+    parser.add_option("-g", "--overlappingchannels", dest="overlap_channels", default=["5"],
+                      help="Comma separated list of the number of overlapping channels (only for asymmetric model)",
+                      type='string', action='callback', callback=string_splitter)
+    parser.add_option("-b", "--blockwidth", dest="block_width", default=["1"],
+                      help="Comma separated list of block widths",
+                      type='string', action='callback', callback=string_splitter)
+    parser.add_option("-t", "--theta-parameter", dest="theta", default=["1.0"],
+                      help="Comma separated list of theta parameters",
+                      type='string', action='callback', callback=string_splitter)
+    parser.add_option("-o", "--acdp", dest="acdp", default=["0.0"],
+                      help="Comma separated list of adjacent channel detection probabilities",
+                      type='string', action='callback', callback=string_splitter)
+    parser.add_option("-n", "--nodes", dest="nodes", default=2,
+                      help="How many nodes are used")
+    parser.add_option("-i", "--iterations", dest="iterations", default=1,
+                      help="How often to repeat the simulation for each point")
+    parser.add_option("-r", "--randomreplace", dest="randomreplace", default=False, action="store_true",
+                      help="Whether to replace unavailable channels with random ones")
+    parser.add_option("-e", "--engine", dest="engine", default="slot",
+                      help="Which simulation engine to use (slot or batch)")
+    parser.add_option("-x", "--exact", dest="exact", default=False, action="store_true",
+                      help="Evaluate deterministic algorithms exactly over all asynchronous start offsets")
+    parser.add_option("--analytic-random", dest="analytic_random", default=False, action="store_true",
+                      help="Sample the TTR of the random algorithm from its geometric distribution instead of simulating slots (two nodes only)")
+    parser.add_option("-j", "--jobs", dest="jobs", type="int", default=1,
+                      help="How many worker processes to use")
+    addTargetCiOption(parser)
+    parser.add_option("--time-budget", dest="time_budget", type="float", default=None,
+                      help="Stop after this many seconds, -i is the maximum number of iterations")
+    parser.add_option("--cache", dest="cache_dir", metavar="DIR", default=None,
+                      help="Take results from a result cache in DIR and add new ones to it")
+    parser.add_option("--checkpoint", dest="checkpoint", metavar="FILE", default=None,
+                      help="Save the state of the simulation to FILE every minute")
+    parser.add_option("--resume", dest="resume", default=False, action="store_true",
+                      help="Continue from the checkpoint in FILE if it belongs to the same simulation")
+    parser.add_option("--profile", dest="profile", metavar="FILE", default=None,
+                      help="Print the wall time, slots per second and peak memory growth of each phase of each point to stderr and write them as JSON to FILE")
+    parser.add_option("--store", dest="store", metavar="DIR", default=None,
+                      help="Append the result rows of all points to the columnar result store in DIR")
+    (options, args) = parser.parse_args()
+
+    config = Config(algorithms=options.algorithm,
+                    model=options.model,
+                    num_nodes=int(options.nodes),
+                    iterations=int(options.iterations),
+                    has_random_replace=options.randomreplace,
+                    engine=options.engine,
+                    exact=options.exact,
+                    analytic_random=options.analytic_random,
+                    jobs=options.jobs,
+                    target_ci=options.target_ci,
+                    time_budget=options.time_budget,
+                    cache_dir=options.cache_dir,
+                    checkpoint=options.checkpoint,
+                    resume=options.resume,
+                    profile=bool(options.profile))
+    grid = {'num_channels': [int(x) for x in options.channels],
+            'num_overlap_channels': [int(x) for x in options.overlap_channels],
+            'block_width': [int(x) for x in options.block_width],
+            'theta': [float(x) for x in options.theta],
+            'acdp': [float(x) for x in options.acdp]}
+
+    print HEADER
+    profiles = []
+    store = ResultStoreWriter(options.store) if options.store else None
+    try:
+        for result in sweep(config, grid):
+            if result.profile:
+                start = result.profile.start()
+            for row in result.formatRows():
+                print row
+            if store:
+                store.appendResult(result)
+            sys.stdout.flush()
+            if result.profile:
+                result.profile.stop(start, 'output')
+                profiles.append((vars(result.config), result.profile))
+    except (ValueError, RuntimeError) as e:
+        print e
+        sys.exit()
+    finally:
+        if store:
+            store.close()
+    if options.profile:
+        writeProfiles(options.profile, profiles)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,167 @@
+#
+# This file is part of RendezvousSim. RendezvousSim is free software: you can
+# redistribute it and/or modify it under the terms of the GNU General Public
+# License as published by the Free Software Foundation, version 2.
+#
+# This program is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE.  See the GNU General Public License for more
+# details.
+#
+# You should have received a copy of the GNU General Public License along with
+# this program; if not, write to the Free Software Foundation, Inc., 51
+# Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+#
+# Copyright 2014 Andre Puschmann <andre.puschmann@tu-ilmenau.de>
+
+"""
+Columnar store for the raw result of every trial. A store is a directory with
+a meta.json file and shards of up to SHARD_SIZE records. Each column of a
+shard is a plain .npy file, e.g. 00000.ttr.npy, so columns can be memory-mapped
+with np.load(..., mmap_mode='r') without parsing text.
+
+ Columns:
+ trial    iteration the trial belongs to
+ alg      index of the algorithm in the algorithms list of meta.json
+ ttr      time to rendezvous in slots, MAX_SLOTS for failed trials
+ offset   number of slots the asynchronous node started earlier
+ ok       whether the nodes met
+
+ meta.json is rewritten after every shard, so the shards written before a run
+ was killed can still be read.
+
+ Example:
+ store = TrialStore('raw')
+ js = store.getAlgorithmIndex('js')
+ ttr = [shard['ttr'][shard['alg'] == js] for shard in store.iterShards(['alg', 'ttr'])]
+"""
+
+import os
+import json
+import numpy as np
+
+COLUMNS = [('trial', np.int64), ('alg', np.int16), ('ttr', np.int32), ('offset', np.int32), ('ok', np.bool_)]
+SHARD_SIZE = 2**20 # records per shard
+META_FILE = 'meta.json'
+
+
+# Collects the records of the trials simulated by one engine
+class TrialLog():
+    def __init__(self, algorithms):
+        self.algorithms = list(algorithms)
+        self.columns = dict((name, []) for (name, dtype) in COLUMNS)
+
+    def append(self, trial, alg, ttr, offset, ok):
+        self.extend([trial], alg, [ttr], [offset], [ok])
+
+    # Add the records of many trials of the same algorithm at once
+    def extend(self, trials, alg, ttr, offsets, ok):
+        trials = np.asarray(trials, dtype=np.int64)
+        self.columns['trial'].append(trials)
+        self.columns['alg'].append(np.full(trials.size, self.algorithms.index(alg), dtype=np.int16))
+        self.columns['ttr'].append(np.asarray(ttr, dtype=np.int32))
+        self.columns['offset'].append(np.asarray(offsets, dtype=np.int32))
+        self.columns['ok'].append(np.asarray(ok, dtype=np.bool_))
+
+    # Return a dict of one array per column, sorted by trial and algorithm
+    def getColumns(self):
+        columns = {}
+        for (name, dtype) in COLUMNS:
+            if self.columns[name]:
+                columns[name] = np.concatenate(self.columns[name])
+            else:
+                columns[name] = np.zeros(0, dtype=dtype)
+        order = np.lexsort((columns['alg'], columns['trial']))
+        return dict((name, column[order]) for (name, column) in columns.items())
+
+
+# Appends records to a new store, records are buffered until a shard is full
+class TrialStoreWriter():
+    def __init__(self, dirname, algorithms, parameters=None):
+        self.dirname = dirname
+        if not os.path.isdir(dirname):
+            os.makedirs(dirname)
+        for filename in os.listdir(dirname):
+            if filename == META_FILE or filename.endswith('.npy'):
+                os.remove(os.path.join(dirname, filename))
+        self.meta = {'algorithms': list(algorithms),
+                     'columns': [name for (name, dtype) in COLUMNS],
+                     'parameters': parameters or {},
+                     'shards': []}
+        self.buffer = []
+        self.buffered = 0
+        self.writeMeta()
+
+    def append(self, columns):
+        self.buffer.append(columns)
+        self.buffered += columns['trial'].size
+        while self.buffered >= SHARD_SIZE:
+            self.writeShard(SHARD_SIZE)
+
+    def writeShard(self, size):
+        columns = {}
+        for (name, dtype) in COLUMNS:
+            columns[name] = np.concatenate([chunk[name] for chunk in self.buffer])
+        shard = "%05d" % len(self.meta['shards'])
+        for (name, dtype) in COLUMNS:
+            np.save(os.path.join(self.dirname, "%s.%s.npy" % (shard, name)), columns[name][:size])
+        self.meta['shards'].append({'name': shard, 'records': size})
+        self.writeMeta()
+
+        rest = dict((name, column[size:]) for (name, column) in columns.items())
+        self.buffer = [rest]
+        self.buffered = rest['trial'].size
+
+    # Replace meta.json at once, so readers never see a partial file
+    def writeMeta(self):
+        filename = os.path.join(self.dirname, META_FILE)
+        with open(filename + '.tmp', 'w') as f:
+            json.dump(self.meta, f, indent=1, sort_keys=True)
+        os.rename(filename + '.tmp', filename)
+
+    def close(self):
+        if self.buffered:
+            self.writeShard(self.buffered)
+
+
+# Read-only access to a directory of .npy column shards listed in meta.json,
+# all columns are memory-mapped and are never read into memory at once.
+# Subclasses set the (name, dtype) of their columns.
+class ShardedStore():
+    columns = []
+
+    def __init__(self, dirname):
+        self.dirname = dirname
+        with open(os.path.join(dirname, META_FILE)) as f:
+            self.meta = json.load(f)
+        self.algorithms = [str(alg) for alg in self.meta['algorithms']]
+
+    def getAlgorithms(self):
+        return self.algorithms
+
+    # Return the memory-mapped column of each shard
+    def getShards(self, name):
+        return [columns[name] for columns in self.iterShards([name])]
+
+    # Iterate over the shards in the order they were written, each as dict of
+    # its memory-mapped columns with the given names, by default all columns
+    def iterShards(self, names=None):
+        if names is None:
+            names = [name for (name, dtype) in self.columns]
+        for shard in self.meta['shards']:
+            yield dict((name, np.load(os.path.join(self.dirname, "%s.%s.npy" % (shard['name'], name)), mmap_mode='r'))
+                       for name in names)
+
+
+# Read-only access to a trial store
+class TrialStore(ShardedStore):
+    columns = COLUMNS
+
+    def getAlgorithmIndex(self, alg):
+        return self.algorithms.index(alg)
+
+    def getParameters(self):
+        return self.meta['parameters']
+
+    def len(self):
+        return sum(shard['records'] for shard in self.meta['shards'])